@@ -0,0 +1,201 @@
+import time
+import pandas as pd
+
+# Níveis da pirâmide, do mais fino ao mais grosso (apelido -> frequência do pandas)
+NIVEIS = {
+    'diario': 'D',
+    'semanal': 'W-FRI',  # semanas de dias úteis, fechando na sexta-feira
+    'mensal': 'ME',
+    'anual': 'YE',
+}
+
+
+# Função para agregar a série diária em uma frequência (OHLC + média)
+def agregar(df, frequencia):
+    """
+    Agrega a série diária ('ds', 'y') na frequência informada.
+
+    Retorna:
+    - DataFrame com 'ds' (fim do período), 'open', 'high', 'low', 'close', 'mean',
+      'count' e 'y' (igual à média, para uso direto nos modelos).
+    """
+    if frequencia == 'D':
+        agregado = df[['ds', 'y']].copy()
+        for coluna in ('open', 'high', 'low', 'close', 'mean'):
+            agregado[coluna] = agregado['y']
+        agregado['count'] = 1
+        return agregado.reset_index(drop=True)
+
+    serie = df.set_index('ds')['y']
+    agregado = serie.resample(frequencia).agg(
+        ['first', 'max', 'min', 'last', 'mean', 'count']
+    )
+    agregado.columns = ['open', 'high', 'low', 'close', 'mean', 'count']
+    agregado = agregado[agregado['count'] > 0].copy()
+    agregado['y'] = agregado['mean']
+    agregado.index.name = 'ds'
+    return agregado.reset_index()
+
+
+# Função para construir a pirâmide de agregações
+def construir_piramide(df):
+    """
+    Pré-calcula as agregações semanal, mensal e anual de uma série diária.
+
+    Parâmetros:
+    - df: DataFrame ordenado com as colunas 'ds' e 'y' (ver `postech_TC4.carregar_dados`).
+
+    Retorna:
+    - Dicionário {nível: DataFrame agregado}, incluindo o nível 'diario'.
+    """
+    if df.empty:
+        raise ValueError("O DataFrame está vazio; não é possível construir as agregações.")
+
+    return {nivel: agregar(df, frequencia) for nivel, frequencia in NIVEIS.items()}
+
+
+# Função para atualizar a pirâmide com novos dados diários
+def atualizar_piramide(piramide, novos_dados):
+    """
+    Atualiza a pirâmide de forma incremental.
+
+    Apenas os períodos a partir do primeiro período afetado pelos novos dados
+    são recalculados; os períodos anteriores são mantidos como estão.
+    Datas já existentes são substituídas pelos valores novos.
+
+    Retorna:
+    - Nova pirâmide (dicionário {nível: DataFrame}).
+    """
+    if novos_dados.empty:
+        return piramide
+
+    diario = pd.concat([piramide['diario'][['ds', 'y']], novos_dados[['ds', 'y']]])
+    diario = diario.drop_duplicates(subset='ds', keep='last').sort_values('ds')
+    diario.reset_index(drop=True, inplace=True)
+    primeira_data = novos_dados['ds'].min()
+
+    nova_piramide = {}
+    for nivel, frequencia in NIVEIS.items():
+        anterior = piramide[nivel]
+        # Os períodos são fechados à direita: o último rótulo anterior aos novos
+        # dados encerra o último período que não precisa ser recalculado
+        fechados = anterior['ds'] < primeira_data
+        if not fechados.any():
+            nova_piramide[nivel] = agregar(diario, frequencia)
+            continue
+
+        corte = anterior.loc[fechados, 'ds'].max()
+        recalculado = agregar(diario[diario['ds'] > corte], frequencia)
+        mantido = anterior[anterior['ds'] <= corte]
+        nova_piramide[nivel] = pd.concat([mantido, recalculado], ignore_index=True)
+
+    return nova_piramide
+
+
+# Função para consultar o nível mais grosso que ainda preenche a visualização
+def consultar(piramide, inicio=None, fim=None, pontos_minimos=200):
+    """
+    Retorna os dados do nível mais grosso que tenha pelo menos `pontos_minimos`
+    pontos no intervalo pedido (ex.: a largura do gráfico em pixels).
+    Se nenhum nível atingir o mínimo, retorna o nível diário.
+
+    Retorna:
+    - Tupla (nível, DataFrame recortado ao intervalo).
+    """
+    for nivel in reversed(list(NIVEIS)):
+        dados = piramide[nivel]
+        mascara = pd.Series(True, index=dados.index)
+        if inicio is not None:
+            mascara &= dados['ds'] >= pd.Timestamp(inicio)
+        if fim is not None:
+            mascara &= dados['ds'] <= pd.Timestamp(fim)
+
+        if mascara.sum() >= pontos_minimos or nivel == 'diario':
+            return nivel, dados[mascara]
+
+
+# Função para treinar um modelo em uma resolução da pirâmide
+def treinar_por_resolucao(piramide, nivel='mensal', modelo='prophet', proporcao_treino=0.8, executor=None):
+    """
+    Treina Prophet ou ARIMA sobre um nível da pirâmide (ex.: Prophet mensal
+    para horizontes longos).
+
+    Retorna:
+    - Tupla (modelo ajustado, dados_treino, dados_teste).
+    """
+    import postech_TC4
+
+    if nivel not in NIVEIS:
+        raise ValueError(f"Nível inválido: {nivel}. Use um de {list(NIVEIS)}.")
+
+    dados = piramide[nivel][['ds', 'y']]
+    dados_treino, dados_teste = postech_TC4.dividir_dados(dados, proporcao_treino=proporcao_treino)
+
+    if modelo == 'prophet':
+        ajustado = postech_TC4.treinar_modelo_prophet(
+            dados_treino, executor=executor, frequencia=NIVEIS[nivel]
+        )
+    elif modelo == 'arima':
+        ajustado = postech_TC4.treinar_modelo_arima(dados_treino)
+    else:
+        raise ValueError("O modelo deve ser 'prophet' ou 'arima'.")
+
+    return ajustado, dados_treino, dados_teste
+
+
+# Função para medir o ganho de tempo de ajuste e de renderização em relação ao diário
+def medir_ganho(piramide, niveis=('diario', 'semanal', 'mensal'), modelo='prophet'):
+    """
+    Mede, para cada nível, o tempo de ajuste do modelo e o tempo de
+    renderização de um gráfico da série completa.
+
+    Retorna:
+    - DataFrame com os tempos (s) e o ganho em relação ao nível diário.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    linhas = []
+    for nivel in niveis:
+        inicio = time.perf_counter()
+        treinar_por_resolucao(piramide, nivel, modelo=modelo)
+        tempo_ajuste = time.perf_counter() - inicio
+
+        dados = piramide[nivel]
+        inicio = time.perf_counter()
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.plot(dados['ds'], dados['mean'])
+        ax.fill_between(dados['ds'], dados['low'], dados['high'], alpha=0.3)
+        fig.canvas.draw()
+        plt.close(fig)
+        tempo_render = time.perf_counter() - inicio
+
+        linhas.append({
+            'nivel': nivel,
+            'pontos': len(dados),
+            'tempo_ajuste': tempo_ajuste,
+            'tempo_render': tempo_render,
+        })
+
+    resultado = pd.DataFrame(linhas).set_index('nivel')
+    base = resultado.iloc[0]
+    resultado['ganho_ajuste'] = base['tempo_ajuste'] / resultado['tempo_ajuste']
+    resultado['ganho_render'] = base['tempo_render'] / resultado['tempo_render']
+    return resultado
+
+
+if __name__ == "__main__":
+    import os
+    import postech_TC4
+
+    caminho_arquivo = os.path.join("data", "ipeadata[04-11-2024-09-30].csv")
+
+    try:
+        df = postech_TC4.carregar_dados(caminho_arquivo)
+        piramide = construir_piramide(df)
+        for modelo in ('prophet', 'arima'):
+            print(f"Modelo: {modelo}")
+            print(medir_ganho(piramide, modelo=modelo).to_string(float_format="{:.3f}".format))
+    except Exception as e:
+        print(f"Erro: {e}")
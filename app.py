@@ -1,21 +1,22 @@
-import os
+import imagens
 import dashboard
 import dashboard2
 import sobre_nos
 import streamlit as st
 
 # Função para exibir imagem e legenda
-def exibir_imagem_e_legenda(imagem_path, legenda_texto, largura_imagem=150):
-    # Verifique se o arquivo existe antes de carregar
-    if os.path.exists(imagem_path):
-        st.image(imagem_path, width=largura_imagem)
+def exibir_imagem_e_legenda(imagem_nome, legenda_texto, largura_imagem=150):
+    # Bytes da imagem lidos uma única vez por processo (versão otimizada, se existir)
+    imagem = imagens.carregar_imagem(imagem_nome)
+    if imagem is not None:
+        st.image(imagem, width=largura_imagem)
         
         st.markdown(
             f'<p style="text-align: left; font-weight: bold;">{legenda_texto}</p>', 
             unsafe_allow_html=True
         )
     else:
-        st.error(f"A imagem '{imagem_path}' não foi encontrada!")
+        st.error(f"A imagem '{imagem_nome}' não foi encontrada!")
 
 # Funções para cada página
 def dashboard_previsao_petroleo():
@@ -33,7 +34,7 @@ st.set_page_config(
 )
 
 # Definir a imagem e legenda para as páginas
-imagem_path = "assents/fiap.png"
+imagem_nome = "fiap.png"
 legenda = "Pós Tech"
 
 # Exibir imagem e legenda nas páginas certas
@@ -48,7 +49,7 @@ pagina_selecionada = st.sidebar.selectbox("Selecione uma página", paginas.keys(
 
 # Exibir a imagem e legenda apenas nas páginas que não são 'Sobre nós'
 if pagina_selecionada != "Sobre nós":
-    exibir_imagem_e_legenda(imagem_path, legenda)
+    exibir_imagem_e_legenda(imagem_nome, legenda)
 
 # Chamar a função da página selecionada
 paginas[pagina_selecionada]()
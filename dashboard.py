@@ -1,5 +1,12 @@
+import io
 import os
 import numpy as np
+import mcmc
+import ensemble
+import pool_stan
+import agregacoes
+import pontos_mudanca
+import exportacao
 import postech_TC4
 import pandas as pd
 import streamlit as st
@@ -8,6 +15,89 @@ import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 from prophet.plot import plot_cross_validation_metric
 
+# Pool de workers Stan único, compartilhado pelas sessões para os ajustes em paralelo
+# (cadeias MCMC e ensemble); tamanho em `pool_stan.workers_padrao` (configurável por PETRO_STAN_WORKERS)
+@st.cache_resource
+def obter_pool_stan():
+    pool = pool_stan.PoolStan()
+    pool.aquecer()
+    return pool
+
+# Pirâmide de agregações calculada uma vez por conjunto de dados
+@st.cache_data
+def obter_piramide(df):
+    return agregacoes.construir_piramide(df)
+
+# Ajuste por MCMC (lento) reaproveitado entre reruns e sessões com os mesmos dados
+@st.cache_resource(show_spinner=False)
+def ajustar_prophet_mcmc(dados_treino, n_cadeias, changepoints=None):
+    return postech_TC4.treinar_modelo_prophet(
+        dados_treino,
+        executor=obter_pool_stan(),
+        changepoints=list(changepoints) if changepoints else None,
+        mcmc_samples=mcmc.MCMC_SAMPLES,
+        n_cadeias=n_cadeias,
+        aquecimento=mcmc.AQUECIMENTO,
+    )
+
+# Regimes de preço (PELT) detectados uma vez sobre o histórico completo (desde 1987);
+# a chave do cache é o conteúdo do arquivo, então a leitura do histórico também é feita uma vez só
+@st.cache_data(show_spinner=False)
+def obter_regimes(conteudo_arquivo):
+    df_completo = postech_TC4.carregar_dados(io.BytesIO(conteudo_arquivo), data_inicio=None)
+    return pontos_mudanca.detectar_regimes(df_completo)
+
+# Função para exibir a série histórica na resolução adequada ao período
+# (fragmento: mudar o período reexecuta só o gráfico, sem refazer EDA, decomposição e ajuste)
+@st.fragment
+def exibir_serie_historica(piramide, regimes=None):
+    st.subheader("Série Histórica")
+    st.write(
+        """
+        O gráfico utiliza a agregação (diária, semanal, mensal ou anual) mais grossa que ainda preenche o período selecionado, 
+        exibindo a média do período e a faixa entre mínimo e máximo.
+        """
+    )
+
+    diario = piramide['diario']
+    data_min = diario['ds'].min().date()
+    data_max = diario['ds'].max().date()
+    inicio, fim = st.slider(
+        "Período",
+        min_value=data_min,
+        max_value=data_max,
+        value=(data_min, data_max),
+        format="DD/MM/YYYY",
+    )
+
+    nivel, dados = agregacoes.consultar(piramide, inicio, fim)
+
+    fig_serie, ax_serie = plt.subplots(figsize=(10, 4))
+    ax_serie.plot(dados['ds'], dados['mean'], label='Média')
+    ax_serie.fill_between(dados['ds'], dados['low'], dados['high'], alpha=0.3, label='Mínimo/Máximo')
+    if regimes is not None:
+        # Apenas os regimes de crise que se sobrepõem ao período exibido
+        visiveis = regimes[(regimes['fim'] >= pd.Timestamp(inicio)) & (regimes['inicio'] <= pd.Timestamp(fim))]
+        pontos_mudanca.anotar_regimes(ax_serie, visiveis)
+    ax_serie.set_title(f"Preço do Petróleo Brent (resolução: {nivel})")
+    ax_serie.set_xlabel("Data")
+    ax_serie.set_ylabel("Preço (USD)")
+    ax_serie.legend()
+    fig_serie.tight_layout()
+    st.pyplot(fig_serie)
+    # Cada zoom cria uma figura nova: fecha para não acumular no registro global do pyplot
+    plt.close(fig_serie)
+
+    if regimes is not None:
+        with st.expander("Regimes detectados (PELT sobre todo o histórico)"):
+            st.write(
+                """
+                Os regimes são trechos com média e volatilidade dos retornos diários estáveis. As áreas em vermelho 
+                no gráfico marcam os regimes de crise (volatilidade bem acima da mediana).
+                """
+            )
+            st.dataframe(regimes)
+
 # Função para exibir EDA
 def exibir_eda(df):
 
@@ -98,12 +188,12 @@ def exibir_analise_residuos(df_residuos):
 
 # Função para exibir o gráfico e métricas
 def exibir_previsao_detalhada(
-    dados_treino, dados_teste, previsoes, mae, rmse, acuracia
+    dados_treino, dados_teste, previsoes, mae, rmse, acuracia, nome_modelo="Prophet"
 ):
-    st.subheader("Previsões do Modelo Prophet")
+    st.subheader(f"Previsões do Modelo {nome_modelo}")
     st.write(
-        """
-        Este gráfico apresenta os dados históricos de treino, os dados reais de teste e as previsões geradas pelo modelo Prophet, 
+        f"""
+        Este gráfico apresenta os dados históricos de treino, os dados reais de teste e as previsões geradas pelo modelo {nome_modelo}, 
         permitindo visualizar a precisão das previsões em relação aos dados reais.
         """
     )
@@ -138,7 +228,7 @@ def exibir_previsao_detalhada(
 
     plt.xlabel('Data')
     plt.ylabel('Preço (USD)')
-    plt.title('Previsões do Modelo Prophet')
+    plt.title(f'Previsões do Modelo {nome_modelo}')
     plt.grid(":")
     plt.legend()
     plt.tight_layout()  # Ajustar layout para evitar cortes
@@ -157,14 +247,72 @@ def exibir_previsao_detalhada(
     st.write(f"**Root Mean Squared Error (RMSE):** {rmse:.2f}")
     st.write(f"**Acurácia:** {acuracia:.2f}%")
 
-    # Preparar o CSV com as previsões futuras
-    previsoes_futuras = previsoes[previsoes['ds'] > dados_teste['ds'].max()]
-    previsoes_futuras_csv = previsoes_futuras[["ds", "yhat"]].to_csv(index=False)
+# Função para exibir os diagnósticos de convergência do ajuste por MCMC
+def exibir_diagnosticos_mcmc(modelo, n_cadeias):
+    diagnosticos = mcmc.diagnosticar(modelo, n_cadeias)
+    nao_convergidos = int((~diagnosticos['convergiu']).sum())
+    if nao_convergidos:
+        st.warning(
+            f"{nao_convergidos} de {len(diagnosticos)} parâmetros não atingiram R-hat < {mcmc.LIMITE_RHAT} "
+            f"e ESS ≥ {mcmc.ESS_MINIMO}. Os intervalos podem não ser confiáveis; use mais cadeias."
+        )
+    else:
+        st.success(f"As {n_cadeias} cadeias MCMC convergiram (R-hat < {mcmc.LIMITE_RHAT}, ESS ≥ {mcmc.ESS_MINIMO}).")
+
+    with st.expander("Diagnósticos MCMC (R-hat e ESS por parâmetro)"):
+        st.dataframe(diagnosticos)
+
+# Função para exportar as previsões e artefatos do modelo
+# (fragmento: os widgets de exportação reexecutam só esta seção, sem retreinar os modelos)
+@st.fragment
+def exibir_exportacao(previsoes_futuras, metricas, df_residuos, modelo, incluir_posterior=False):
+    st.subheader("Exportar Previsões")
+    st.write(
+        """
+        Escolha o formato e as colunas desejadas. O arquivo só é gerado quando solicitado.
+        """
+    )
+
+    formatos = list(exportacao.FORMATOS.keys()) + ["zip (pacote completo)"]
+    if incluir_posterior:
+        # Amostras do ajuste por MCMC em formato compacto (ver mcmc.carregar_posterior)
+        formatos.append("npz (amostras a posteriori)")
+    formato = st.selectbox("Formato", formatos)
+    incluir_intervalos = st.checkbox("Incluir intervalos de confiança", value=False)
+    incluir_componentes = st.checkbox("Incluir componentes (tendência, sazonalidades, feriados)", value=False)
+
+    if not st.button("Gerar arquivo para download"):
+        return
+
+    nome_arquivo = "previsoes_futuras_petroleo"
+    try:
+        if formato in exportacao.FORMATOS:
+            extensao, mime = exportacao.FORMATOS[formato]
+            arquivo = exportacao.gerar_artefato(
+                previsoes_futuras, formato, incluir_intervalos, incluir_componentes
+            )
+        elif formato.startswith("npz"):
+            nome_arquivo, extensao, mime = "posterior_prophet", "npz", "application/octet-stream"
+            arquivo = exportacao.gerar_posterior(modelo)
+        else:
+            extensao, mime = "zip", "application/zip"
+            arquivo = exportacao.gerar_pacote_zip(
+                previsoes_futuras, metricas, df_residuos, modelo,
+                incluir_intervalos=incluir_intervalos,
+                incluir_componentes=incluir_componentes,
+            )
+
+        with arquivo:
+            dados = arquivo.read()
+    except Exception as e:
+        st.error(f"Erro ao gerar o arquivo: {e}")
+        return
+
     st.download_button(
-        "Baixar Previsões Futuras em CSV",
-        data=previsoes_futuras_csv,
-        file_name="previsoes_futuras_petroleo.csv",
-        mime="text/csv",
+        f"Baixar arquivo ({formato})",
+        data=dados,
+        file_name=f"{nome_arquivo}.{extensao}",
+        mime=mime,
     )
 
 # Função para exibir insights
@@ -233,6 +381,37 @@ def main():
         value=365,
         step=1,
     )
+    tipo_modelo = st.sidebar.selectbox(
+        "Modelo",
+        ["Prophet", "Ensemble (Prophet + ARIMA)"],
+    )
+    usar_regimes = st.sidebar.checkbox(
+        "Usar mudanças de regime como changepoints do Prophet",
+        value=False,
+    )
+    # O ajuste por MCMC só está disponível para o Prophet isolado
+    apenas_prophet = tipo_modelo == "Prophet"
+    usar_mcmc = st.sidebar.checkbox(
+        "Incerteza da sazonalidade (MCMC, bem mais lento)",
+        value=False,
+        disabled=not apenas_prophet,
+    ) and apenas_prophet
+    n_cadeias = st.sidebar.slider(
+        "Cadeias MCMC",
+        min_value=1,
+        max_value=8,
+        value=mcmc.N_CADEIAS,
+        disabled=not usar_mcmc,
+    )
+    if usar_mcmc:
+        # As cadeias rodam no pool compartilhado: as que excedem o número de workers ficam na fila
+        n_workers = obter_pool_stan().n_workers
+        em_paralelo = min(n_cadeias, n_workers)
+        na_fila = n_cadeias - em_paralelo
+        st.sidebar.caption(
+            f"{em_paralelo} cadeia(s) em paralelo ({n_workers} worker(s) Stan)"
+            + (f"; {na_fila} na fila, em {-(-n_cadeias // n_workers)} rodadas." if na_fila else ".")
+        )
 
     # Upload do arquivo de dados
     st.sidebar.header("Upload do Arquivo de Dados")
@@ -242,6 +421,13 @@ def main():
         # Carregar os dados usando o módulo postech_TC4
         try:
             df = postech_TC4.carregar_dados(arquivo)
+            # A detecção de regimes usa todo o histórico (desde 1987), não apenas o período modelado;
+            # se falhar, o restante do dashboard é exibido sem os regimes
+            try:
+                regimes = obter_regimes(arquivo.getvalue())
+            except Exception as e:
+                regimes = None
+                st.warning(f"Não foi possível detectar os regimes de preço: {e}")
             st.write("### Dados Históricos do Preço do Petróleo Brent")
 
             # Exibir algumas informações sobre os dados carregados
@@ -249,6 +435,8 @@ def main():
             st.write("**Visualização dos dados carregados:**")
             st.write(df.head())
 
+            exibir_serie_historica(obter_piramide(df), regimes)
+
             # EDA
             exibir_eda(df)
 
@@ -313,12 +501,36 @@ def main():
     # Treinar o modelo e obter previsões para todo o período
     with st.spinner('Treinando o modelo, por favor aguarde...'):
         try:
-            modelo = postech_TC4.treinar_modelo_prophet(dados_treino)
-
             # Criar DataFrame com datas futuras (incluindo datas do teste e previsões futuras)
             total_periods = len(dados_teste) + periodo_previsao
-            futuro = modelo.make_future_dataframe(periods=total_periods, freq='D')  # Especificar a frequência
-            previsoes = modelo.predict(futuro)
+
+            changepoints = pontos_mudanca.datas_mudanca(regimes) if usar_regimes and regimes is not None else None
+            if tipo_modelo == "Prophet":
+                if usar_mcmc:
+                    modelo = ajustar_prophet_mcmc(
+                        dados_treino, n_cadeias, tuple(changepoints) if changepoints else None
+                    )
+                    exibir_diagnosticos_mcmc(modelo, n_cadeias)
+                else:
+                    # Um ajuste MAP isolado é feito no próprio processo; o pool fica para o MCMC e o ensemble
+                    modelo = postech_TC4.treinar_modelo_prophet(dados_treino, changepoints=changepoints)
+                futuro = modelo.make_future_dataframe(periods=total_periods, freq='D')  # Especificar a frequência
+                previsoes = modelo.predict(futuro)
+            else:
+                # Mesmas datas do make_future_dataframe: histórico de treino + dias corridos futuros
+                datas_futuras = pd.date_range(
+                    dados_treino['ds'].max() + pd.Timedelta(days=1), periods=total_periods, freq='D'
+                )
+                datas = pd.concat([dados_treino['ds'], pd.Series(datas_futuras)], ignore_index=True)
+                # Os 2 ajustes de cada membro rodam em paralelo no pool compartilhado
+                previsoes, pesos, _ = ensemble.prever_ensemble(
+                    dados_treino, datas, executor=obter_pool_stan(), changepoints=changepoints
+                )
+                modelo = None
+                st.write(
+                    "**Pesos do ensemble:** "
+                    + ", ".join(f"{nome}: {peso:.2f}" for nome, peso in pesos.items())
+                )
 
             # Verificar se todas as datas de dados_teste estão em previsoes
             previsoes_set = set(previsoes['ds'])
@@ -340,7 +552,7 @@ def main():
             mae, rmse, acuracia = postech_TC4.calcular_metricas(dados_teste, previsoes)
 
             exibir_previsao_detalhada(
-                dados_treino, dados_teste, previsoes, mae, rmse, acuracia
+                dados_treino, dados_teste, previsoes, mae, rmse, acuracia, tipo_modelo
             )
 
             # Análise dos resíduos
@@ -359,6 +571,10 @@ def main():
             df_residuos = postech_TC4.analisar_residuos(df_merged)
             exibir_analise_residuos(df_residuos)
 
+            previsoes_futuras = previsoes[previsoes['ds'] > dados_teste.index.max()]
+            metricas = {"mae": mae, "rmse": rmse, "acuracia": acuracia}
+            exibir_exportacao(previsoes_futuras, metricas, df_residuos, modelo, incluir_posterior=usar_mcmc)
+
             st.success('Modelo treinado com sucesso!')
         except Exception as e:
             st.error(f"Ocorreu um erro durante o treinamento: {e}")
@@ -1,4 +1,5 @@
 import os
+import imagens
 import numpy as np
 import pandas as pd
 import seaborn as sns
@@ -16,7 +17,7 @@ def main():
 
     """, unsafe_allow_html=True) 
 
-    st.image("assents/view1.png", caption="Figura 1 - Painel interativo com dados da série histórica de preços do Petróleo Brent")
+    st.image(imagens.carregar_imagem("view1.png"), caption="Figura 1 - Painel interativo com dados da série histórica de preços do Petróleo Brent")
     
     st.write("""
     A partir da observação do comportamento dos dados no tempo foram identificados os picos e vales, 
@@ -25,7 +26,7 @@ def main():
 
     """) 
     
-    st.image("assents/view2.png", caption="Figura 2 - Série histórica de preços do Petróleo Brent") 
+    st.image(imagens.carregar_imagem("view2.png"), caption="Figura 2 - Série histórica de preços do Petróleo Brent") 
 
     st.write("""
     Os principais períodos de crise identificados, com reflexos visíveis na série histórica, foram: 
@@ -90,7 +91,7 @@ def main():
     """)
     
     st.subheader("Resultado")
-    st.image("assents/view3.png", caption="Figura 3 - Gráfico de Resultados do modelo 1")
+    st.image(imagens.carregar_imagem("view3.png"), caption="Figura 3 - Gráfico de Resultados do modelo 1")
 
     # Resultados e métricas
     st.subheader("Métricas e Acurácia")
@@ -117,7 +118,7 @@ def main():
     """)
 
     st.subheader("Resultado")
-    st.image("assents/view5.png", caption="Figura 4 - Gráfico de Resultados do modelo 2")
+    st.image(imagens.carregar_imagem("view5.png"), caption="Figura 4 - Gráfico de Resultados do modelo 2")
 
     # Resultados e métricas
     st.subheader("Métricas e Acurácia")
@@ -141,7 +142,7 @@ def main():
     """)
     
     #Grafico
-    st.image("assents/view4.jpeg", caption="Figura 5 - Gráfico de Resultados do modelo 3")
+    st.image(imagens.carregar_imagem("view4.jpeg"), caption="Figura 5 - Gráfico de Resultados do modelo 3")
     # Resultados e métricas
     st.subheader("Métricas e Acurácia")
     st.markdown("""
@@ -0,0 +1,228 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Modelos que compõem o ensemble
+MEMBROS = ('prophet', 'arima')
+
+# Fração final dos dados de treino usada para estimar os pesos (fora da amostra)
+PROPORCAO_VALIDACAO = 0.2
+
+# Custo relativo de ajuste de cada membro: as tarefas mais caras são submetidas
+# primeiro, para que as mais baratas preencham os workers livres atrás delas
+CUSTO_RELATIVO = {'prophet': 2, 'arima': 1}
+
+
+# Função para prever com um único membro do ensemble
+def prever_membro(membro, dados_treino, datas, changepoints=None):
+    """
+    Ajusta um membro do ensemble e prevê as datas informadas.
+
+    Parâmetros:
+    - membro: 'prophet' ou 'arima'.
+    - dados_treino: DataFrame com as colunas 'ds' e 'y' (dias úteis).
+    - datas: Sequência de datas a prever.
+    - changepoints: Datas de mudança de tendência do Prophet (ignoradas pelo ARIMA).
+
+    Retorna:
+    - Tupla (DataFrame com 'ds', 'yhat', 'yhat_lower', 'yhat_upper'; tempo de ajuste em segundos).
+    """
+    import postech_TC4
+
+    datas = pd.DatetimeIndex(pd.to_datetime(datas))
+    inicio = time.perf_counter()
+
+    if membro == 'prophet':
+        modelo = postech_TC4.treinar_modelo_prophet(dados_treino, changepoints=changepoints)
+        previsoes = modelo.predict(pd.DataFrame({'ds': datas}))
+        previsoes = previsoes[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    elif membro == 'arima':
+        resultado = postech_TC4.treinar_modelo_arima(dados_treino)
+        # O ARIMA prevê observações (dias úteis); datas fora delas usam o último dia útil anterior
+        primeiro_dia = dados_treino['ds'].iloc[-1] + pd.offsets.BDay(1)
+        dias_uteis = pd.bdate_range(primeiro_dia, max(datas.max(), primeiro_dia))
+        previsao = resultado.get_forecast(steps=len(dias_uteis))
+        intervalo = previsao.conf_int(alpha=0.05)  # 95%, como o interval_width do Prophet
+        serie = pd.DataFrame({
+            'yhat': previsao.predicted_mean,
+            'yhat_lower': intervalo[:, 0],
+            'yhat_upper': intervalo[:, 1],
+        }, index=dias_uteis)
+        # Datas do próprio período de treino recebem as previsões um passo à frente; as d
+        # primeiras (ordem de diferenciação) não têm previsão (o statsmodels devolve 0 com
+        # intervalo difuso) e ficam como NaN
+        inicio_treino = resultado.model.k_diff
+        previsao_treino = resultado.get_prediction(start=inicio_treino)
+        intervalo_treino = previsao_treino.conf_int(alpha=0.05)
+        ajustados = pd.DataFrame({
+            'yhat': previsao_treino.predicted_mean,
+            'yhat_lower': intervalo_treino[:, 0],
+            'yhat_upper': intervalo_treino[:, 1],
+        }, index=pd.DatetimeIndex(dados_treino['ds'].iloc[inicio_treino:]))
+        serie = pd.concat([ajustados, serie])
+        previsoes = serie.reindex(datas, method='ffill').rename_axis('ds').reset_index()
+    else:
+        raise ValueError(f"Membro do ensemble inválido: {membro}. Use um de {list(MEMBROS)}.")
+
+    return previsoes.reset_index(drop=True), time.perf_counter() - inicio
+
+
+# Função para empacotar os argumentos de prever_membro (usada no map do pool)
+def _tarefa_membro(args):
+    return prever_membro(*args)
+
+
+# Função para calcular os pesos a partir dos erros fora da amostra
+def calcular_pesos(reais, previsoes_membros):
+    """
+    Calcula os pesos pelo inverso do MAE de validação de cada membro.
+
+    Parâmetros:
+    - reais: Array com os valores reais do período de validação.
+    - previsoes_membros: Array (n_membros x n_datas) com as previsões de cada membro.
+
+    Retorna:
+    - Array com os pesos normalizados (soma 1).
+    """
+    erros = np.abs(np.asarray(previsoes_membros) - np.asarray(reais)[np.newaxis, :])
+    mae = np.nanmean(erros, axis=1)
+    inverso = 1 / np.maximum(mae, np.finfo(float).eps)
+    return inverso / inverso.sum()
+
+
+# Função para combinar as previsões dos membros pela média ponderada, ignorando membros sem previsão
+def combinar(pesos, matriz):
+    """
+    Parâmetros:
+    - pesos: Array com os pesos de cada membro.
+    - matriz: Array (n_membros x n_datas); NaN onde o membro não tem previsão.
+
+    Retorna:
+    - Array com a média ponderada por data, com os pesos renormalizados entre os
+      membros disponíveis (NaN se nenhum membro tiver previsão).
+    """
+    disponiveis = ~np.isnan(matriz)
+    pesos_datas = np.where(disponiveis, np.asarray(pesos)[:, np.newaxis], 0.0)
+    soma_pesos = pesos_datas.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (pesos_datas * np.where(disponiveis, matriz, 0.0)).sum(axis=0) / soma_pesos
+
+
+# Função para gerar as previsões do ensemble Prophet + ARIMA
+def prever_ensemble(dados_treino, datas, executor=None, membros=MEMBROS,
+                    proporcao_validacao=PROPORCAO_VALIDACAO, changepoints=None):
+    """
+    Ajusta os membros em paralelo e combina as previsões.
+
+    Cada membro é ajustado duas vezes, em tarefas independentes e simultâneas:
+    uma sem o trecho final do treino (para medir o erro fora da amostra e
+    calcular os pesos) e outra com todo o treino (para a previsão final).
+    Previsões pontuais e intervalos são combinados pela média ponderada.
+
+    Parâmetros:
+    - dados_treino: DataFrame com as colunas 'ds' e 'y'.
+    - datas: Datas a prever (ex.: `modelo.make_future_dataframe(...)['ds']`).
+    - executor: Objeto com método `map` (ex.: PoolStan); se None, um PoolStan
+      temporário é criado com um worker por tarefa.
+    - changepoints: Datas de mudança de tendência repassadas ao Prophet
+      (ex.: `pontos_mudanca.datas_mudanca(regimes)`).
+
+    Retorna:
+    - Tupla (DataFrame de previsões, dicionário de pesos, dicionário de tempos em segundos).
+      O DataFrame tem 'ds', 'yhat', 'yhat_lower', 'yhat_upper' e 'yhat_<membro>'.
+    """
+    if dados_treino.empty:
+        raise ValueError("O conjunto de dados de treino está vazio.")
+
+    tamanho_ajuste = int(len(dados_treino) * (1 - proporcao_validacao))
+    treino_ajuste = dados_treino.iloc[:tamanho_ajuste]
+    validacao = dados_treino.iloc[tamanho_ajuste:]
+    if treino_ajuste.empty or validacao.empty:
+        raise ValueError("Dados de treino insuficientes para a validação do ensemble.")
+
+    tarefas = [(membro, treino_ajuste, validacao['ds'], changepoints) for membro in membros]
+    tarefas += [(membro, dados_treino, datas, changepoints) for membro in membros]
+    # Ordem de submissão: membros mais caros primeiro (ordenação estável, validação antes do final)
+    ordem = sorted(range(len(tarefas)), key=lambda i: -CUSTO_RELATIVO.get(tarefas[i][0], 0))
+    tarefas = [tarefas[i] for i in ordem]
+
+    inicio = time.perf_counter()
+    if executor is None:
+        import pool_stan
+        with pool_stan.PoolStan(n_workers=len(tarefas)) as pool:
+            resultados = list(pool.map(_tarefa_membro, tarefas))
+    else:
+        resultados = list(executor.map(_tarefa_membro, tarefas))
+    tempo_total = time.perf_counter() - inicio
+
+    # Volta à ordem original: validações de cada membro seguidas dos ajustes finais
+    originais = [None] * len(resultados)
+    for posicao, resultado in zip(ordem, resultados):
+        originais[posicao] = resultado
+    resultados = originais
+
+    n = len(membros)
+    validacoes, finais = resultados[:n], resultados[n:]
+
+    pesos = calcular_pesos(
+        validacao['y'].to_numpy(),
+        np.vstack([previsao['yhat'].to_numpy() for previsao, _ in validacoes]),
+    )
+
+    previsoes = pd.DataFrame({'ds': finais[0][0]['ds']})
+    for coluna in ('yhat', 'yhat_lower', 'yhat_upper'):
+        matriz = np.vstack([previsao[coluna].to_numpy() for previsao, _ in finais])
+        previsoes[coluna] = combinar(pesos, matriz)
+    for membro, (previsao, _) in zip(membros, finais):
+        previsoes[f'yhat_{membro}'] = previsao['yhat'].to_numpy()
+
+    tempos = {
+        membro: tempo_validacao + tempo_final
+        for membro, (_, tempo_validacao), (_, tempo_final) in zip(membros, validacoes, finais)
+    }
+    tempos['ensemble'] = tempo_total
+
+    return previsoes, dict(zip(membros, pesos)), tempos
+
+
+# Função para comparar acurácia e latência do ensemble com os membros isolados
+def comparar_com_membros(dados_treino, dados_teste, executor=None):
+    """
+    Retorna:
+    - DataFrame com MAE, RMSE, acurácia e tempo (s) de cada membro e do ensemble.
+      O tempo de cada membro é a soma dos seus dois ajustes, como se rodasse sozinho.
+    """
+    import postech_TC4
+
+    previsoes, pesos, tempos = prever_ensemble(dados_treino, dados_teste['ds'], executor=executor)
+
+    linhas = []
+    for nome in list(pesos) + ['ensemble']:
+        coluna = 'yhat' if nome == 'ensemble' else f'yhat_{nome}'
+        mae, rmse, acuracia = postech_TC4.calcular_metricas(
+            dados_teste, previsoes[['ds', coluna]].rename(columns={coluna: 'yhat'})
+        )
+        linhas.append({
+            'modelo': nome,
+            'peso': pesos.get(nome, 1.0),
+            'mae': mae,
+            'rmse': rmse,
+            'acuracia': acuracia,
+            'tempo': tempos[nome],
+        })
+
+    return pd.DataFrame(linhas).set_index('modelo')
+
+
+if __name__ == "__main__":
+    import os
+    import postech_TC4
+
+    caminho_arquivo = os.path.join("data", "ipeadata[04-11-2024-09-30].csv")
+
+    try:
+        df = postech_TC4.carregar_dados(caminho_arquivo)
+        dados_treino, dados_teste = postech_TC4.dividir_dados(df, proporcao_treino=0.8)
+        print(comparar_com_membros(dados_treino, dados_teste).to_string(float_format="{:.2f}".format))
+    except Exception as e:
+        print(f"Erro: {e}")
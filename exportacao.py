@@ -0,0 +1,179 @@
+import gzip
+import json
+import zipfile
+import tempfile
+
+# Formatos suportados para exportação: extensão do arquivo e tipo MIME
+FORMATOS = {
+    'csv': ('csv', 'text/csv'),
+    'csv.gz': ('csv.gz', 'application/gzip'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+# Número de linhas escritas por vez
+TAMANHO_CHUNK = 50_000
+
+# Acima deste tamanho (em bytes) o artefato é transferido da memória para o disco
+LIMITE_MEMORIA = 8 * 1024 * 1024
+
+# Colunas geradas pelo Prophet que não são componentes do modelo
+_COLUNAS_BASE = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+# Função para selecionar as colunas a serem exportadas
+def selecionar_colunas(previsoes, incluir_intervalos=False, incluir_componentes=False):
+    """
+    Define as colunas do arquivo exportado.
+
+    Parâmetros:
+    - previsoes: DataFrame retornado por `modelo.predict`.
+    - incluir_intervalos: Inclui 'yhat_lower' e 'yhat_upper'.
+    - incluir_componentes: Inclui tendência, sazonalidades e feriados (e seus intervalos, se solicitados).
+
+    Retorna:
+    - Lista com os nomes das colunas.
+    """
+    colunas = ['ds', 'yhat']
+    if incluir_intervalos:
+        colunas += ['yhat_lower', 'yhat_upper']
+
+    if incluir_componentes:
+        for coluna in previsoes.columns:
+            if coluna in _COLUNAS_BASE:
+                continue
+            if coluna.endswith(('_lower', '_upper')) and not incluir_intervalos:
+                continue
+            colunas.append(coluna)
+
+    faltando = [coluna for coluna in colunas if coluna not in previsoes.columns]
+    if faltando:
+        raise ValueError(f"As previsões não contêm as colunas: {', '.join(faltando)}")
+
+    return colunas
+
+
+# Função para escrever um DataFrame em CSV, em blocos, num arquivo binário já aberto
+def _escrever_csv_em_chunks(df, arquivo_binario, tamanho_chunk=TAMANHO_CHUNK):
+    for inicio in range(0, max(len(df), 1), tamanho_chunk):
+        bloco = df.iloc[inicio:inicio + tamanho_chunk].to_csv(index=False, header=(inicio == 0))
+        arquivo_binario.write(bloco.encode('utf-8'))
+
+
+# Função para escrever um DataFrame em Parquet, um row group por bloco
+def _escrever_parquet_em_chunks(df, arquivo_binario, tamanho_chunk=TAMANHO_CHUNK):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError(f"A exportação em Parquet requer o pacote 'pyarrow': {e}")
+
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    writer = pq.ParquetWriter(arquivo_binario, schema)
+    try:
+        for inicio in range(0, max(len(df), 1), tamanho_chunk):
+            bloco = df.iloc[inicio:inicio + tamanho_chunk]
+            writer.write_table(pa.Table.from_pandas(bloco, schema=schema, preserve_index=False))
+    finally:
+        writer.close()
+
+
+# Função para gerar o arquivo de previsões no formato escolhido
+def gerar_artefato(previsoes, formato='csv', incluir_intervalos=False, incluir_componentes=False,
+                   tamanho_chunk=TAMANHO_CHUNK):
+    """
+    Gera o arquivo de previsões sob demanda, escrevendo em blocos.
+
+    O conteúdo é escrito num SpooledTemporaryFile, que passa para o disco
+    quando ultrapassa LIMITE_MEMORIA.
+
+    Parâmetros:
+    - previsoes: DataFrame com as previsões.
+    - formato: 'csv', 'csv.gz' ou 'parquet'.
+    - incluir_intervalos / incluir_componentes: ver `selecionar_colunas`.
+
+    Retorna:
+    - Arquivo binário posicionado no início, pronto para leitura.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação inválido: {formato}. Use um de {list(FORMATOS)}.")
+
+    colunas = selecionar_colunas(previsoes, incluir_intervalos, incluir_componentes)
+    df = previsoes[colunas]
+
+    destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA)
+    try:
+        if formato == 'csv':
+            _escrever_csv_em_chunks(df, destino, tamanho_chunk)
+        elif formato == 'csv.gz':
+            with gzip.GzipFile(fileobj=destino, mode='wb') as arquivo_gz:
+                _escrever_csv_em_chunks(df, arquivo_gz, tamanho_chunk)
+        else:
+            _escrever_parquet_em_chunks(df, destino, tamanho_chunk)
+    except Exception:
+        destino.close()
+        raise
+
+    destino.seek(0)
+    return destino
+
+
+# Função para gerar o pacote zip com previsões, métricas, resíduos e modelo
+def gerar_pacote_zip(previsoes, metricas=None, df_residuos=None, modelo=None,
+                     incluir_intervalos=True, incluir_componentes=False,
+                     tamanho_chunk=TAMANHO_CHUNK):
+    """
+    Gera um arquivo zip com os artefatos da previsão:
+    - previsoes.csv: previsões (com intervalos/componentes, se solicitados);
+    - metricas.json: dicionário de métricas (ex.: MAE, RMSE, acurácia);
+    - residuos.csv: resíduos do conjunto de teste;
+    - modelo.json: modelo Prophet serializado com `model_to_json`.
+
+    Retorna:
+    - Arquivo binário posicionado no início, pronto para leitura.
+    """
+    colunas = selecionar_colunas(previsoes, incluir_intervalos, incluir_componentes)
+
+    destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA)
+    try:
+        with zipfile.ZipFile(destino, mode='w', compression=zipfile.ZIP_DEFLATED) as pacote:
+            with pacote.open('previsoes.csv', mode='w') as arquivo:
+                _escrever_csv_em_chunks(previsoes[colunas], arquivo, tamanho_chunk)
+
+            if metricas is not None:
+                pacote.writestr('metricas.json', json.dumps(metricas, ensure_ascii=False, indent=2))
+
+            if df_residuos is not None:
+                with pacote.open('residuos.csv', mode='w') as arquivo:
+                    _escrever_csv_em_chunks(df_residuos.reset_index(), arquivo, tamanho_chunk)
+
+            if modelo is not None:
+                from prophet.serialize import model_to_json
+                pacote.writestr('modelo.json', model_to_json(modelo))
+    except Exception:
+        destino.close()
+        raise
+
+    destino.seek(0)
+    return destino
+
+
+# Função para gerar o arquivo .npz com as amostras a posteriori de um ajuste por MCMC
+def gerar_posterior(modelo):
+    """
+    Gera o .npz de `mcmc.salvar_posterior` sob demanda; `mcmc.carregar_posterior`
+    reconstrói o modelo (com o número de cadeias) para o predict.
+
+    Retorna:
+    - Arquivo binário posicionado no início, pronto para leitura.
+    """
+    import mcmc
+
+    destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA)
+    try:
+        mcmc.salvar_posterior(modelo, destino)
+    except Exception:
+        destino.close()
+        raise
+
+    destino.seek(0)
+    return destino
@@ -0,0 +1,26 @@
+import os
+import streamlit as st
+
+# Pasta com as imagens originais e pasta com as versões otimizadas (ver otimizar_assets.py)
+PASTA_ASSETS = "assents"
+PASTA_OTIMIZADAS = os.path.join(PASTA_ASSETS, "otimizadas")
+
+
+# Função para obter o caminho da versão otimizada de uma imagem
+def caminho_otimizado(nome_arquivo):
+    base, _ = os.path.splitext(nome_arquivo)
+    return os.path.join(PASTA_OTIMIZADAS, f"{base}.png")
+
+
+# Função para carregar os bytes de uma imagem, lidos do disco uma única vez por processo
+@st.cache_resource(show_spinner=False)
+def carregar_imagem(nome_arquivo):
+    """
+    Retorna os bytes da versão otimizada da imagem ou, se ela ainda não tiver
+    sido gerada, os bytes do arquivo original. Retorna None se nenhum existir.
+    """
+    for caminho in (caminho_otimizado(nome_arquivo), os.path.join(PASTA_ASSETS, nome_arquivo)):
+        if os.path.exists(caminho):
+            with open(caminho, "rb") as arquivo:
+                return arquivo.read()
+    return None
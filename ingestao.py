@@ -0,0 +1,339 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Colunas do arquivo do IPEA (as mesmas esperadas por postech_TC4.carregar_dados)
+COLUNA_DATA = 'Data'
+COLUNA_PRECO = 'Preço - petróleo bruto - Brent (FOB) - US$ - Energy Information Administration (EIA) - EIA366_PBRENT366'
+
+# Linhas lidas por chunk; limita a memória usada independentemente do tamanho do arquivo
+TAMANHO_CHUNK = 250_000
+
+# Tamanho dos blocos lidos pelo motor 'pyarrow', em bytes
+TAMANHO_BLOCO = 4 * 1024 ** 2
+
+AGREGACOES = ('close', 'mean')
+MOTORES = ('pandas', 'pyarrow')
+
+
+# Função para resumir um chunk em parciais diárias (combináveis entre chunks)
+def _resumir_chunk(datas, precos):
+    """
+    Retorna um DataFrame indexado pelo dia com 'soma', 'contagem', 'ultimo_instante'
+    e 'ultimo_preco'. Parciais de chunks diferentes do mesmo dia podem ser combinadas
+    sem perda, o que permite que um dia fique dividido entre dois chunks.
+    """
+    chunk = pd.DataFrame({'instante': datas, 'preco': precos})
+    if not chunk['instante'].is_monotonic_increasing:
+        # Ordenação estável: em empates de horário, vale a última linha do arquivo
+        chunk = chunk.sort_values('instante', kind='mergesort')
+
+    grupos = chunk.groupby(chunk['instante'].dt.normalize(), sort=False)
+    return pd.DataFrame({
+        'soma': grupos['preco'].sum(),
+        'contagem': grupos['preco'].count(),
+        'ultimo_instante': grupos['instante'].last(),
+        'ultimo_preco': grupos['preco'].last(),
+    })
+
+
+# Função para combinar as parciais acumuladas com as de um novo chunk
+def _combinar_parciais(acumulado, parcial):
+    if acumulado is None:
+        return parcial
+
+    juntos = pd.concat([acumulado, parcial])
+    # O fechamento é o preço do instante mais recente; em empate, prevalece o chunk mais novo
+    juntos = juntos.sort_values('ultimo_instante', kind='mergesort')
+    grupos = juntos.groupby(level=0, sort=False)
+    return pd.DataFrame({
+        'soma': grupos['soma'].sum(),
+        'contagem': grupos['contagem'].sum(),
+        'ultimo_instante': grupos['ultimo_instante'].last(),
+        'ultimo_preco': grupos['ultimo_preco'].last(),
+    })
+
+
+# Função para abrir o CSV com o parser do pandas (valida o cabeçalho de imediato)
+def _chunks_pandas(arquivo, coluna_data, coluna_preco, tamanho_chunk, formato_data):
+    try:
+        leitor = pd.read_csv(
+            arquivo, delimiter=',', usecols=[coluna_data, coluna_preco],
+            dtype={coluna_data: str}, chunksize=tamanho_chunk,
+        )
+    except ValueError:
+        raise ValueError("Por favor, verifique o arquivo e envie um compatível com a base de dados esperada.")
+    return _converter_chunks_pandas(leitor, coluna_data, coluna_preco, formato_data)
+
+
+# Função que gera tuplas (datas, precos) por chunk; valores inválidos viram NaT/NaN
+def _converter_chunks_pandas(leitor, coluna_data, coluna_preco, formato_data):
+    with leitor:
+        for chunk in leitor:
+            if formato_data is None:
+                primeiros = chunk[coluna_data].dropna()
+                if not primeiros.empty:
+                    formato_data = guess_datetime_format(primeiros.iloc[0])
+
+            datas = pd.to_datetime(chunk[coluna_data], format=formato_data, errors='coerce')
+            precos = pd.to_numeric(chunk[coluna_preco], errors='coerce')
+            yield datas, precos
+
+
+# Função para abrir o CSV com o leitor em streaming do pyarrow
+def _chunks_pyarrow(arquivo, coluna_data, coluna_preco, tamanho_bloco, formato_data):
+    """
+    Retorna um iterador de tuplas (datas, precos) por bloco. As datas são convertidas
+    pelo próprio pyarrow (ISO 8601 ou `formato_data`), sem criar strings Python por linha.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError as e:
+        raise ValueError(f"O motor 'pyarrow' requer o pacote 'pyarrow': {e}")
+
+    parsers = [pa_csv.ISO8601] + ([formato_data] if formato_data else [])
+    try:
+        leitor = pa_csv.open_csv(
+            arquivo,
+            read_options=pa_csv.ReadOptions(block_size=tamanho_bloco),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=[coluna_data, coluna_preco],
+                column_types={coluna_data: pa.timestamp('ns'), coluna_preco: pa.float64()},
+                timestamp_parsers=parsers,
+            ),
+        )
+    except KeyError:
+        raise ValueError("Por favor, verifique o arquivo e envie um compatível com a base de dados esperada.")
+    except pa.ArrowException as e:
+        # O primeiro bloco já é lido e convertido na abertura
+        raise ValueError(f"Erro ao ler o arquivo CSV: {e}")
+
+    return (
+        (bloco.column(coluna_data).to_pandas(), bloco.column(coluna_preco).to_pandas())
+        for bloco in leitor
+    )
+
+
+# Função para carregar arquivos grandes (intradiários ou tick a tick) em chunks
+def carregar_dados_em_chunks(arquivo, agregacao='close', tamanho_chunk=TAMANHO_CHUNK,
+                             data_inicio='2000-01-01', coluna_data=COLUNA_DATA,
+                             coluna_preco=COLUNA_PRECO, formato_data=None, motor='pandas',
+                             estatisticas=None):
+    """
+    Carrega um CSV em chunks e reamostra os preços para frequência diária.
+
+    Cada chunk é validado e reduzido a parciais diárias (soma, contagem e último
+    preço), que são combinadas com as anteriores. A memória usada depende do
+    tamanho do chunk e do número de dias, não do número de linhas do arquivo.
+
+    Parâmetros:
+    - arquivo: Caminho ou objeto de arquivo CSV (também aceita CSV comprimido, ex.: '.gz').
+    - agregacao: 'close' (último preço do dia) ou 'mean' (média dos preços do dia).
+    - tamanho_chunk: Número de linhas lidas por vez (motor 'pandas').
+    - data_inicio: Primeira data considerada; None mantém todo o histórico.
+    - coluna_data, coluna_preco: Nomes das colunas de data/hora e de preço.
+    - formato_data: Formato das datas; se None, é inferido do primeiro valor do arquivo
+      (como faz o `pd.to_datetime` com a coluna inteira) e reaproveitado nos demais chunks.
+    - motor: 'pandas' descarta linhas com data ou preço inválidos; 'pyarrow' é bem mais
+      rápido, lê blocos de TAMANHO_BLOCO bytes, espera datas ISO 8601 (ou `formato_data`)
+      e interrompe a leitura com ValueError em linhas inválidas. Indicado para feeds
+      gerados por máquina.
+    - estatisticas: Dicionário opcional preenchido com 'linhas_lidas', 'linhas_invalidas' e 'chunks'.
+
+    Retorna:
+    - DataFrame com as colunas 'ds' e 'y', no mesmo formato de `postech_TC4.carregar_dados`.
+    """
+    if agregacao not in AGREGACOES:
+        raise ValueError(f"Agregação inválida: {agregacao}. Use uma de {list(AGREGACOES)}.")
+    if motor not in MOTORES:
+        raise ValueError(f"Motor inválido: {motor}. Use um de {list(MOTORES)}.")
+    if tamanho_chunk < 1:
+        raise ValueError("O tamanho do chunk deve ser maior que zero.")
+
+    if isinstance(arquivo, str) and arquivo.endswith(('.xlsx', '.xls')):
+        import postech_TC4
+        arquivo_csv = arquivo.replace('.xlsx', '.csv').replace('.xls', '.csv')
+        postech_TC4.converter_excel_para_csv(arquivo, arquivo_csv)
+        arquivo = arquivo_csv
+
+    try:
+        if motor == 'pandas':
+            chunks = _chunks_pandas(arquivo, coluna_data, coluna_preco, tamanho_chunk, formato_data)
+        else:
+            chunks = _chunks_pyarrow(arquivo, coluna_data, coluna_preco, TAMANHO_BLOCO, formato_data)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Erro ao ler o arquivo CSV: {e}")
+
+    acumulado = None
+    linhas_lidas = linhas_invalidas = n_chunks = 0
+
+    try:
+        for datas, precos in chunks:
+            n_chunks += 1
+            linhas_lidas += len(datas)
+
+            validas = datas.notna() & precos.notna()
+            linhas_invalidas += int((~validas).sum())
+            if not validas.any():
+                continue
+
+            parcial = _resumir_chunk(datas[validas], precos[validas].astype(float))
+            acumulado = _combinar_parciais(acumulado, parcial)
+    except Exception as e:
+        raise ValueError(f"Erro ao ler o arquivo CSV: {e}")
+
+    if estatisticas is not None:
+        estatisticas.update(linhas_lidas=linhas_lidas, linhas_invalidas=linhas_invalidas, chunks=n_chunks)
+
+    if acumulado is None:
+        raise ValueError("Após o processamento, o DataFrame está vazio. Verifique os dados de entrada.")
+
+    if agregacao == 'close':
+        y = acumulado['ultimo_preco']
+    else:
+        y = acumulado['soma'] / acumulado['contagem']
+
+    df = pd.DataFrame({'ds': acumulado.index, 'y': y.to_numpy()})
+    if data_inicio is not None:
+        df = df[df['ds'] >= data_inicio]
+    df = df[df['ds'].dt.dayofweek < 5]  # Considerar apenas dias úteis
+    df.sort_values('ds', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    if df.empty:
+        raise ValueError("Após o processamento, o DataFrame está vazio. Verifique os dados de entrada.")
+
+    return df
+
+
+# Função para gerar um arquivo sintético de preços tick a tick (para medições)
+def gerar_arquivo_sintetico(caminho, tamanho_gb=2.0, ticks_por_dia=50_000, inicio='2000-01-03', semente=0):
+    """
+    Gera um CSV com as colunas 'timestamp' e 'preco' (passeio aleatório), escrito
+    dia a dia para que a memória usada não dependa do tamanho do arquivo.
+
+    Retorna:
+    - Número de linhas escritas.
+    """
+    gerador = np.random.default_rng(semente)
+    limite = tamanho_gb * 1024 ** 3
+    dia = pd.Timestamp(inicio)
+    preco = 50.0
+    linhas = 0
+
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write('timestamp,preco\n')
+        while arquivo.tell() < limite:
+            if dia.dayofweek < 5:
+                segundos = np.sort(gerador.uniform(0, 86_400, ticks_por_dia))
+                instantes = dia + pd.to_timedelta(segundos, unit='s')
+                precos = np.maximum(preco + np.cumsum(gerador.normal(0, 0.01, ticks_por_dia)), 0.01)
+                preco = precos[-1]
+                pd.DataFrame({'timestamp': instantes, 'preco': precos.round(4)}).to_csv(
+                    arquivo, header=False, index=False, date_format='%Y-%m-%d %H:%M:%S.%f'
+                )
+                linhas += ticks_por_dia
+            dia += pd.Timedelta(days=1)
+
+    return linhas
+
+
+# Função para obter o pico de memória (RSS) do processo atual, em MB
+def _pico_memoria_mb():
+    # O ru_maxrss herda o pico do processo pai no fork; o VmHWM do Linux é zerado no exec
+    try:
+        with open('/proc/self/status') as status:
+            for linha in status:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # Sem /proc: o ru_maxrss está em KB no Linux/BSD e em bytes no macOS
+    try:
+        import resource
+    except ImportError:
+        return float('nan')  # Windows: sem o módulo resource, o pico não é medido
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+# Função executada em um processo novo para medir o carregamento isoladamente
+def _medir_no_processo(caminho, kwargs):
+    memoria_inicial = _pico_memoria_mb()
+    estatisticas = {}
+    inicio = time.perf_counter()
+    df = carregar_dados_em_chunks(caminho, estatisticas=estatisticas, **kwargs)
+    segundos = time.perf_counter() - inicio
+
+    return {
+        'linhas': estatisticas['linhas_lidas'],
+        'dias': len(df),
+        'segundos': segundos,
+        'linhas_por_segundo': estatisticas['linhas_lidas'] / segundos,
+        'memoria_inicial_mb': memoria_inicial,
+        'pico_memoria_mb': _pico_memoria_mb(),
+        'tamanho_arquivo_mb': os.path.getsize(caminho) / 1024 ** 2,
+    }
+
+
+# Função para medir vazão (linhas/s) e pico de memória do carregamento em chunks
+def medir_ingestao(caminho, **kwargs):
+    """
+    Carrega o arquivo em um processo novo, para que o pico de memória (RSS) medido
+    seja apenas o do carregamento.
+
+    Retorna:
+    - Dicionário com 'linhas', 'dias', 'segundos', 'linhas_por_segundo',
+      'memoria_inicial_mb' (após os imports), 'pico_memoria_mb' e 'tamanho_arquivo_mb'.
+      As memórias são NaN onde o pico não pode ser medido (ex.: Windows).
+    """
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as executor:
+        return executor.submit(_medir_no_processo, caminho, kwargs).result()
+
+
+if __name__ == "__main__":
+    import tempfile
+    import postech_TC4
+
+    caminho_arquivo = os.path.join("data", "ipeadata[04-11-2024-09-30].csv")
+
+    try:
+        # O carregamento em chunks deve reproduzir o carregamento tradicional
+        esperado = postech_TC4.carregar_dados(caminho_arquivo)
+        obtido = carregar_dados_em_chunks(caminho_arquivo, tamanho_chunk=1_000)
+        pd.testing.assert_frame_equal(esperado[['ds', 'y']], obtido)
+        print(f"Arquivo do IPEA: {len(obtido)} dias, idêntico a postech_TC4.carregar_dados")
+
+        tamanho_gb = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'ticks.csv')
+            gerar_arquivo_sintetico(caminho, tamanho_gb=tamanho_gb)
+            print(f"Arquivo sintético: {os.path.getsize(caminho) / 1024 ** 2:.0f} MB")
+            for motor in MOTORES:
+                resultado = medir_ingestao(
+                    caminho, coluna_data='timestamp', coluna_preco='preco',
+                    formato_data='%Y-%m-%d %H:%M:%S.%f', motor=motor,
+                )
+                if np.isnan(resultado['pico_memoria_mb']):
+                    memoria = "pico de memória indisponível nesta plataforma"
+                else:
+                    memoria = (
+                        f"pico de memória {resultado['pico_memoria_mb']:.0f} MB "
+                        f"({resultado['memoria_inicial_mb']:.0f} MB após os imports)"
+                    )
+                print(
+                    f"{motor:>8}: {resultado['linhas']} linhas, {resultado['dias']} dias em "
+                    f"{resultado['segundos']:.1f}s ({resultado['linhas_por_segundo']:,.0f} linhas/s), {memoria}"
+                )
+    except Exception as e:
+        print(f"Erro: {e}")
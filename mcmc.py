@@ -0,0 +1,348 @@
+import copy
+import time
+import numpy as np
+import pandas as pd
+
+# Número padrão de cadeias; cada uma é uma tarefa do pool Stan, e as que excedem
+# o número de workers esperam na fila do pool
+N_CADEIAS = 4
+
+# Como o `mcmc_samples` do Prophet: metade dele é o número de amostras mantidas por cadeia
+MCMC_SAMPLES = 400
+
+# Iterações de aquecimento por cadeia (o bastante para adaptar a métrica densa)
+AQUECIMENTO = 300
+
+# Métrica densa do NUTS: 'k', 'm' e os 'delta' são fortemente correlacionados (a inclinação de
+# cada trecho é k + soma dos delta anteriores), assim como o nível e os 6 termos da sazonalidade
+# semanal (só há 5 dias úteis distintos); com a métrica diagonal o passo cai para ~5e-4 e quase
+# toda iteração atinge a profundidade máxima da árvore
+METRICA = 'dense_e'
+
+# Pontos de mudança candidatos no MCMC (o MAP usa os 25 do Prophet), quando não são
+# informados (ex.: regimes); cada um é mais uma dimensão correlacionada com as demais
+N_CHANGEPOINTS = 5
+
+SEMENTE = 42
+
+# Parâmetros do modelo Stan usados pelo `predict`; o 'trend' (um valor por data de treino)
+# e as colunas de diagnóstico do amostrador são descartados
+PARAMETROS = ('k', 'm', 'delta', 'sigma_obs', 'beta')
+
+# Limites usuais de convergência: R-hat dividido abaixo de 1,01 e ESS de ao menos 100
+LIMITE_RHAT = 1.01
+ESS_MINIMO = 100
+
+
+# Função executada em um worker para amostrar uma única cadeia
+def _amostrar_cadeia(args):
+    """
+    Ajusta o modelo com uma cadeia MCMC e retorna as amostras dos parâmetros.
+    A especificação do modelo (JSON sem as amostras) só é serializada pela cadeia 0.
+    """
+    from prophet.serialize import model_to_json
+    import postech_TC4
+
+    dados_treino, cadeia, mcmc_samples, aquecimento, semente, frequencia, changepoints = args
+
+    inicio = time.perf_counter()
+    modelo = postech_TC4.criar_modelo_prophet(frequencia, changepoints)
+    modelo.mcmc_samples = mcmc_samples
+    if changepoints is None:
+        modelo.n_changepoints = N_CHANGEPOINTS
+    # As datas são todas à meia-noite: os termos da sazonalidade diária seriam constantes ou nulos
+    modelo.daily_seasonality = False
+    # Mesma semente com chain_ids diferentes: o Stan gera sequências independentes
+    postech_TC4.ajustar_prophet(
+        modelo, dados_treino, chains=1, chain_ids=cadeia + 1, seed=semente,
+        iter_warmup=aquecimento, metric=METRICA, show_progress=False,
+    )
+    tempo = time.perf_counter() - inicio
+
+    amostras = {nome: modelo.params[nome] for nome in PARAMETROS}
+    especificacao = None
+    if cadeia == 0:
+        modelo.params = {}
+        especificacao = model_to_json(modelo)
+    return amostras, especificacao, tempo
+
+
+# Função para ajustar o Prophet por MCMC com as cadeias em paralelo
+def ajustar_mcmc(dados_treino, n_cadeias=N_CADEIAS, mcmc_samples=MCMC_SAMPLES, executor=None,
+                 frequencia='D', changepoints=None, semente=SEMENTE, aquecimento=AQUECIMENTO):
+    """
+    Ajusta o Prophet por MCMC, com uma cadeia por processo.
+
+    O Prophet amostra todas as cadeias em uma única chamada ao Stan, no processo
+    atual. Aqui cada cadeia é uma tarefa independente do pool, e as amostras são
+    concatenadas na ordem das cadeias (o que permite recuperá-las em `diagnosticar`).
+    O modelo é o do MAP, exceto pela sazonalidade diária (desativada) e pelos
+    N_CHANGEPOINTS pontos de mudança candidatos, amostrado com a métrica densa.
+
+    Parâmetros:
+    - dados_treino: DataFrame com as colunas 'ds' e 'y'.
+    - n_cadeias: Número de cadeias.
+    - mcmc_samples: Como no Prophet; são mantidas `mcmc_samples // 2` amostras por cadeia.
+    - executor: Objeto com método `map` (ex.: PoolStan); se None, um PoolStan
+      temporário é criado com um worker por cadeia.
+    - frequencia, changepoints: Ver `postech_TC4.criar_modelo_prophet`.
+    - aquecimento: Iterações de aquecimento (descartadas) por cadeia.
+
+    Retorna:
+    - Modelo Prophet com as amostras a posteriori, pronto para o `predict`, e o
+      número de cadeias em `modelo.n_cadeias`.
+    """
+    from prophet.serialize import model_from_json
+
+    if n_cadeias < 1:
+        raise ValueError("O número de cadeias deve ser maior que zero.")
+    if mcmc_samples < 4:
+        raise ValueError("O número de iterações MCMC por cadeia deve ser de pelo menos 4.")
+    if aquecimento < 1:
+        raise ValueError("O número de iterações de aquecimento deve ser maior que zero.")
+
+    tarefas = [
+        (dados_treino, cadeia, mcmc_samples, aquecimento, semente, frequencia, changepoints)
+        for cadeia in range(n_cadeias)
+    ]
+
+    if executor is None:
+        import pool_stan
+        with pool_stan.PoolStan(n_workers=n_cadeias) as pool:
+            resultados = list(pool.map(_amostrar_cadeia, tarefas))
+    else:
+        resultados = list(executor.map(_amostrar_cadeia, tarefas))
+
+    modelo = model_from_json(resultados[0][1])
+    modelo.params = {
+        nome: np.concatenate([amostras[nome] for amostras, _, _ in resultados])
+        for nome in PARAMETROS
+    }
+    modelo.n_cadeias = n_cadeias
+    return modelo
+
+
+# Função para calcular o R-hat dividido (split R-hat) de cada parâmetro
+def _rhat_dividido(amostras):
+    """
+    amostras: Array (cadeias x iterações x parâmetros).
+    """
+    metade = amostras.shape[1] // 2
+    divididas = np.concatenate([amostras[:, :metade], amostras[:, -metade:]])
+    n = divididas.shape[1]
+
+    variancia_intra = divididas.var(axis=1, ddof=1).mean(axis=0)
+    variancia_entre = n * divididas.mean(axis=1).var(axis=0, ddof=1)
+    variancia_total = (n - 1) / n * variancia_intra + variancia_entre / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(variancia_total / variancia_intra)
+
+
+# Função para calcular o tamanho efetivo da amostra (ESS) de cada parâmetro
+def _ess(amostras):
+    """
+    Estimador do Stan: autocorrelações combinadas entre as cadeias e truncadas
+    pela sequência inicial positiva e monótona de Geyer.
+
+    amostras: Array (cadeias x iterações x parâmetros).
+    """
+    m, n, _ = amostras.shape
+    centradas = amostras - amostras.mean(axis=1, keepdims=True)
+
+    # Autocovariâncias de cada cadeia via FFT (com preenchimento para evitar circularidade)
+    tamanho_fft = 2 ** int(np.ceil(np.log2(2 * n)))
+    espectro = np.fft.rfft(centradas, n=tamanho_fft, axis=1)
+    autocovariancias = np.fft.irfft(espectro * np.conj(espectro), n=tamanho_fft, axis=1)[:, :n] / n
+
+    variancia_media = autocovariancias[:, 0].mean(axis=0) * n / (n - 1)
+    variancia_total = variancia_media * (n - 1) / n
+    if m > 1:
+        variancia_total = variancia_total + amostras.mean(axis=1).var(axis=0, ddof=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = 1 - (variancia_media - autocovariancias.mean(axis=0)) / variancia_total
+    rho[0] = 1
+
+    # Somas de pares consecutivos; mantidas enquanto positivas e forçadas a serem monótonas
+    n_pares = n // 2
+    pares = rho[0:2 * n_pares:2] + rho[1:2 * n_pares:2]
+    positivos = np.cumprod(pares > 0, axis=0).astype(bool)
+    pares = np.minimum.accumulate(np.where(positivos, pares, 0), axis=0)
+    tau = -1 + 2 * pares.sum(axis=0)
+
+    total = m * n
+    ess = total / np.maximum(tau, 1 / np.log10(total))
+    return np.where(variancia_total > 0, ess, np.nan)
+
+
+# Função para calcular os diagnósticos de convergência de um modelo ajustado por MCMC
+def diagnosticar(modelo, n_cadeias=None):
+    """
+    Parâmetros:
+    - modelo: Modelo retornado por `ajustar_mcmc` (ou `carregar_posterior`).
+    - n_cadeias: Número de cadeias usadas no ajuste; se None, usa `modelo.n_cadeias`.
+
+    Retorna:
+    - DataFrame indexado pelo parâmetro (ex.: 'k', 'delta[3]'), com 'media',
+      'desvio', 'rhat', 'ess' e 'convergiu'.
+    """
+    if n_cadeias is None:
+        n_cadeias = getattr(modelo, 'n_cadeias', None)
+        if n_cadeias is None:
+            raise ValueError("O modelo não informa o número de cadeias; passe `n_cadeias`.")
+
+    nomes, colunas = [], []
+    for nome in PARAMETROS:
+        valores = np.asarray(modelo.params[nome])
+        if len(valores) % n_cadeias:
+            raise ValueError("O número de amostras não é divisível pelo número de cadeias.")
+        valores = valores.reshape(n_cadeias, len(valores) // n_cadeias, -1)
+        colunas.append(valores)
+        if valores.shape[2] == 1:
+            nomes.append(nome)
+        else:
+            nomes += [f'{nome}[{i + 1}]' for i in range(valores.shape[2])]
+
+    amostras = np.concatenate(colunas, axis=2)
+    diagnosticos = pd.DataFrame({
+        'media': amostras.mean(axis=(0, 1)),
+        'desvio': amostras.std(axis=(0, 1)),
+        'rhat': _rhat_dividido(amostras),
+        'ess': _ess(amostras),
+    }, index=pd.Index(nomes, name='parametro'))
+
+    # Parâmetros constantes (sem variância) não têm R-hat/ESS definidos e não bloqueiam a convergência
+    diagnosticos['convergiu'] = (
+        (diagnosticos['rhat'] < LIMITE_RHAT) & (diagnosticos['ess'] >= ESS_MINIMO)
+    ) | (diagnosticos['desvio'] == 0)
+    return diagnosticos
+
+
+# Função para salvar as amostras a posteriori em formato compacto
+def salvar_posterior(modelo, arquivo):
+    """
+    Salva o modelo em um arquivo .npz comprimido: a especificação em JSON (sem as
+    amostras), o número de cadeias e um array por parâmetro. O 'trend' não é salvo,
+    pois o `predict` o recalcula a partir de 'k', 'm' e 'delta'.
+
+    Parâmetros:
+    - modelo: Modelo ajustado por `ajustar_mcmc`.
+    - arquivo: Caminho ou objeto de arquivo binário.
+    """
+    from prophet.serialize import model_to_json
+
+    # Cópia rasa: o modelo pode estar em cache e sendo usado por outras sessões
+    copia = copy.copy(modelo)
+    copia.params = {}
+    especificacao = model_to_json(copia)
+
+    np.savez_compressed(
+        arquivo,
+        especificacao=np.frombuffer(especificacao.encode('utf-8'), dtype=np.uint8),
+        n_cadeias=np.array(getattr(modelo, 'n_cadeias', 0)),
+        **{f'param_{nome}': np.asarray(modelo.params[nome]) for nome in PARAMETROS},
+    )
+
+
+# Função para carregar as amostras salvas e obter um modelo pronto para o predict
+def carregar_posterior(arquivo):
+    from prophet.serialize import model_from_json
+
+    try:
+        with np.load(arquivo) as dados:
+            modelo = model_from_json(dados['especificacao'].tobytes().decode('utf-8'))
+            modelo.params = {nome: dados[f'param_{nome}'] for nome in PARAMETROS}
+            n_cadeias = int(dados['n_cadeias']) if 'n_cadeias' in dados.files else 0
+            modelo.n_cadeias = n_cadeias or None  # 0 ou ausente (arquivos antigos): desconhecido
+    except Exception as e:
+        raise ValueError(f"Erro ao carregar as amostras a posteriori: {e}")
+    return modelo
+
+
+# Função para medir o tempo de parede do ajuste MCMC com diferentes números de cadeias
+def medir_escalonamento(dados_treino, cadeias=(1, 2, 4, 8), mcmc_samples=MCMC_SAMPLES,
+                        aquecimento=AQUECIMENTO):
+    """
+    Usa um único PoolStan aquecido, com um worker por cadeia do maior cenário,
+    para que a inicialização dos processos não entre na medição. Todos os cenários
+    são medidos; nos que têm mais cadeias que CPUs disponíveis as cadeias disputam
+    os mesmos núcleos, e o tempo mede a contenção, não o paralelismo.
+
+    Retorna:
+    - DataFrame indexado pelo número de cadeias, com 'cpus', 'segundos', 'segundos_por_cadeia',
+      'speedup' (em relação a rodar as cadeias em série, estimado pelo cenário de 1 cadeia),
+      'rhat_maximo', 'ess_minimo', 'parametros_convergidos' (fração) e 'convergiu'.
+    """
+    import pool_stan
+
+    cpus = pool_stan.cpus_disponiveis()
+    linhas = []
+    with pool_stan.PoolStan(n_workers=max(cadeias)) as pool:
+        pool.aquecer()
+        for n_cadeias in cadeias:
+            inicio = time.perf_counter()
+            modelo = ajustar_mcmc(
+                dados_treino, n_cadeias, mcmc_samples, executor=pool, aquecimento=aquecimento
+            )
+            segundos = time.perf_counter() - inicio
+
+            diagnosticos = diagnosticar(modelo, n_cadeias)
+            linhas.append({
+                'cadeias': n_cadeias,
+                'cpus': cpus,
+                'segundos': segundos,
+                'segundos_por_cadeia': segundos / n_cadeias,
+                'rhat_maximo': diagnosticos['rhat'].max(),
+                'ess_minimo': diagnosticos['ess'].min(),
+                'parametros_convergidos': diagnosticos['convergiu'].mean(),
+                'convergiu': bool(diagnosticos['convergiu'].all()),
+            })
+
+    resultado = pd.DataFrame(linhas).set_index('cadeias')
+    tempo_uma_cadeia = resultado['segundos'].iloc[0] / resultado.index[0]
+    resultado.insert(3, 'speedup', tempo_uma_cadeia * resultado.index / resultado['segundos'])
+    return resultado
+
+
+if __name__ == "__main__":
+    import io
+    import os
+    import postech_TC4
+    from prophet.serialize import model_to_json
+
+    caminho_arquivo = os.path.join("data", "ipeadata[04-11-2024-09-30].csv")
+
+    try:
+        df = postech_TC4.carregar_dados(caminho_arquivo)
+        dados_treino, dados_teste = postech_TC4.dividir_dados(df, proporcao_treino=0.8)
+
+        # Convergência com a configuração padrão (a mesma do dashboard)
+        inicio = time.perf_counter()
+        modelo = ajustar_mcmc(dados_treino)
+        segundos = time.perf_counter() - inicio
+        diagnosticos = diagnosticar(modelo, N_CADEIAS)
+        print(
+            f"{N_CADEIAS} cadeias, {AQUECIMENTO} de aquecimento + {MCMC_SAMPLES // 2} amostras: "
+            f"{segundos:.0f}s, R-hat máximo {diagnosticos['rhat'].max():.3f}, "
+            f"ESS mínimo {diagnosticos['ess'].min():.0f}, "
+            f"{int(diagnosticos['convergiu'].sum())} de {len(diagnosticos)} parâmetros convergidos"
+        )
+
+        # Reaproveitamento das amostras salvas: o predict não volta a amostrar
+        buffer = io.BytesIO()
+        salvar_posterior(modelo, buffer)
+        buffer.seek(0)
+        inicio = time.perf_counter()
+        recarregado = carregar_posterior(buffer)
+        previsoes = recarregado.predict(dados_teste[['ds']])
+        print(
+            f"Posterior salvo: {buffer.getbuffer().nbytes / 1024:.0f} KB "
+            f"(JSON do Prophet: {len(model_to_json(modelo)) / 1024:.0f} KB); "
+            f"carregar + predict: {time.perf_counter() - inicio:.2f}s, cadeias no arquivo: {recarregado.n_cadeias}, "
+            f"colunas de incerteza da sazonalidade: {[c for c in previsoes.columns if c.startswith('yearly')]}"
+        )
+
+        escalonamento = medir_escalonamento(dados_treino)
+        print(escalonamento.to_string(float_format="{:.3f}".format))
+    except Exception as e:
+        print(f"Erro: {e}")
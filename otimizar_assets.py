@@ -0,0 +1,110 @@
+import os
+import time
+from PIL import Image
+from imagens import PASTA_ASSETS, PASTA_OTIMIZADAS, caminho_otimizado
+
+# Largura (px) com que cada imagem é exibida nas páginas
+LARGURA_CONTEUDO = 704  # largura da coluna central do Streamlit (layout "centered")
+LARGURAS_EXIBICAO = {
+    "fiap.png": 150,
+    "view1.png": LARGURA_CONTEUDO,
+    "view2.png": LARGURA_CONTEUDO,
+    "view3.png": LARGURA_CONTEUDO,
+    "view4.jpeg": LARGURA_CONTEUDO,
+    "view5.png": LARGURA_CONTEUDO,
+    "view6.png": 150,
+}
+
+# Imagens exibidas em cada página (o app exibe fiap.png fora da página "Sobre nós")
+IMAGENS_POR_PAGINA = {
+    "dashboard": ["fiap.png"],
+    "dashboard2": ["fiap.png", "view1.png", "view2.png", "view3.png", "view5.png", "view4.jpeg"],
+    "sobre_nos": ["view6.png"],
+}
+
+
+# Função para redimensionar uma imagem e salvá-la como PNG com paleta de 256 cores
+def otimizar_imagem(caminho_origem, caminho_destino, largura_exibicao):
+    """
+    Redimensiona a imagem para a largura de exibição e salva em PNG com paleta.
+
+    O PNG é usado no lugar do WebP porque o `st.image` converte para PNG/JPEG
+    qualquer outro formato, a cada execução da página; PNG com largura menor ou
+    igual à de exibição é enviado sem reprocessamento.
+
+    Retorna:
+    - Tupla (bytes do original, bytes da versão otimizada).
+    """
+    with Image.open(caminho_origem) as imagem:
+        if imagem.mode not in ("RGB", "RGBA"):
+            imagem = imagem.convert("RGBA")
+        if imagem.width > largura_exibicao:
+            altura = round(imagem.height * largura_exibicao / imagem.width)
+            imagem = imagem.resize((largura_exibicao, altura), Image.LANCZOS)
+        imagem = imagem.quantize(256, method=Image.Quantize.FASTOCTREE)
+        imagem.save(caminho_destino, format="PNG", optimize=True)
+
+    return os.path.getsize(caminho_origem), os.path.getsize(caminho_destino)
+
+
+# Função que gera todas as versões otimizadas (etapa de build)
+def otimizar_assets():
+    os.makedirs(PASTA_OTIMIZADAS, exist_ok=True)
+
+    resultado = {}
+    for nome, largura in LARGURAS_EXIBICAO.items():
+        caminho_origem = os.path.join(PASTA_ASSETS, nome)
+        if not os.path.exists(caminho_origem):
+            raise ValueError(f"A imagem '{caminho_origem}' não foi encontrada!")
+        resultado[nome] = otimizar_imagem(caminho_origem, caminho_otimizado(nome), largura)
+
+    return resultado
+
+
+# Função para medir o tempo da primeira renderização e das seguintes de uma página
+def medir_renderizacao(pagina, repeticoes=5):
+    """
+    Executa a página com o AppTest do Streamlit.
+
+    Retorna:
+    - Tupla (tempo da primeira execução, menor tempo entre as reexecuções), em segundos.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    script = (
+        "import os, sys\n"
+        f"os.chdir({os.getcwd()!r})\n"
+        f"sys.path.insert(0, {os.getcwd()!r})\n"
+        f"import {pagina}\n"
+        f"{pagina}.main()\n"
+    )
+    teste = AppTest.from_string(script, default_timeout=60)
+
+    inicio = time.perf_counter()
+    teste.run()
+    primeira = time.perf_counter() - inicio
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        teste.run()
+        tempos.append(time.perf_counter() - inicio)
+
+    return primeira, min(tempos)
+
+
+if __name__ == "__main__":
+    tamanhos = otimizar_assets()
+    for nome, (original, otimizado) in tamanhos.items():
+        print(f"{nome:>12}: {original / 1024:7.1f} KB -> {otimizado / 1024:6.1f} KB")
+
+    print()
+    for pagina, nomes in IMAGENS_POR_PAGINA.items():
+        original = sum(tamanhos[nome][0] for nome in nomes)
+        otimizado = sum(tamanhos[nome][1] for nome in nomes)
+        print(f"{pagina:>12}: {original / 1024:7.1f} KB -> {otimizado / 1024:6.1f} KB por sessão")
+
+    print()
+    for pagina in ("dashboard2", "sobre_nos"):
+        primeira, reexecucao = medir_renderizacao(pagina)
+        print(f"{pagina:>12}: primeira renderização {primeira * 1000:.0f} ms, reexecução {reexecucao * 1000:.0f} ms")
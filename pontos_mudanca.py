@@ -0,0 +1,271 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Tamanho mínimo de um regime, em observações (dias úteis)
+TAMANHO_MINIMO = 20
+
+# Acima deste número de observações a busca passa a usar uma grade (ver `pelt`)
+LIMITE_EXATO = 20_000
+
+# Regimes com volatilidade acima de FATOR_CRISE vezes a mediana são marcados como crise
+FATOR_CRISE = 1.5
+
+# Dias úteis por ano, para anualizar a volatilidade
+DIAS_UTEIS_ANO = 252
+
+
+# Função para calcular o custo dos segmentos (inicios, t] a partir das somas acumuladas
+def _custo_segmentos(soma, soma_quadrados, tamanhos, inicios, t, custo, piso_variancia):
+    somas = soma[t] - soma[inicios]
+    if custo == 'media':
+        return (soma_quadrados[t] - soma_quadrados[inicios]) - somas * somas / tamanhos
+
+    medias = somas / tamanhos
+    variancias = (soma_quadrados[t] - soma_quadrados[inicios]) / tamanhos - medias * medias
+    np.maximum(variancias, piso_variancia, out=variancias)
+    return tamanhos * (np.log(variancias) + np.log(2 * np.pi) + 1)
+
+
+# Função para preparar as somas acumuladas e a penalidade usadas pelo PELT
+def _preparar(valores, custo, penalidade, passo):
+    n = len(valores)
+    if custo not in ('media', 'media_variancia'):
+        raise ValueError("O custo deve ser 'media' ou 'media_variancia'.")
+
+    if passo is None:
+        passo = max(1, int(np.ceil(n / LIMITE_EXATO)))
+
+    if penalidade is None:
+        if custo == 'media':
+            # Variância do ruído estimada pelas diferenças (robusta a mudanças de nível)
+            diferencas = np.diff(valores)
+            sigma = np.median(np.abs(diferencas - np.median(diferencas))) * 1.4826 / np.sqrt(2)
+            penalidade = 2 * np.log(n) * sigma ** 2
+        else:
+            penalidade = 3 * np.log(n)
+
+    # Somas acumuladas nas posições da grade (0, passo, 2*passo, ..., n)
+    posicoes = np.append(np.arange(0, n, passo), n)
+    soma = np.concatenate(([0.0], np.cumsum(valores)))[posicoes]
+    soma_quadrados = np.concatenate(([0.0], np.cumsum(valores ** 2)))[posicoes]
+    piso_variancia = max(np.var(valores), 1.0) * 1e-10
+    return posicoes, soma, soma_quadrados, piso_variancia, penalidade
+
+
+# Função para reconstruir os pontos de mudança a partir do melhor segmento anterior de cada posição
+def _reconstruir(anterior, posicoes):
+    mudancas = []
+    t = len(posicoes) - 1
+    while t > 0:
+        t = anterior[t]
+        if t > 0:
+            mudancas.append(posicoes[t])
+    return np.array(sorted(mudancas), dtype=int)
+
+
+# Função para detectar pontos de mudança com o algoritmo PELT
+def pelt(valores, custo='media_variancia', penalidade=None, tamanho_minimo=TAMANHO_MINIMO, passo=None):
+    """
+    Detecta pontos de mudança com o PELT (Pruned Exact Linear Time).
+
+    Os custos dos segmentos vêm de somas acumuladas, e cada passo avalia
+    todos os candidatos de uma vez com NumPy. A poda descarta candidatos que
+    não podem mais ser ótimos, o que deixa o custo total linear quando o
+    número de mudanças cresce com o tamanho da série.
+
+    Parâmetros:
+    - valores: Array com a série.
+    - custo: 'media' (mudança de nível, custo quadrático) ou 'media_variancia'
+      (mudança de nível e de variância, verossimilhança normal).
+    - penalidade: Penalidade por mudança; se None, usa o BIC.
+    - tamanho_minimo: Número mínimo de observações por segmento.
+    - passo: As mudanças só podem ocorrer em múltiplos de `passo`, que divide o
+      trabalho por cerca de passo². Se None, é 1 (busca exata) até LIMITE_EXATO
+      observações e cresce proporcionalmente depois disso.
+
+    Retorna:
+    - Array com os índices onde cada novo segmento começa.
+    """
+    valores = np.asarray(valores, dtype=float)
+    if len(valores) < 2 * tamanho_minimo:
+        return np.array([], dtype=int)
+    posicoes, soma, soma_quadrados, piso_variancia, penalidade = _preparar(valores, custo, penalidade, passo)
+
+    m_grade = len(posicoes)
+    custo_otimo = np.full(m_grade, np.inf)
+    custo_otimo[0] = -penalidade
+    anterior = np.zeros(m_grade, dtype=int)
+
+    candidatos = np.empty(m_grade, dtype=int)
+    candidatos[0] = 0
+    # Posição em que cada candidato falhou o teste de poda (inf enquanto não falhar)
+    podados_em = np.full(m_grade, np.inf)
+    n_candidatos = 1
+    proximo = 1  # próxima posição da grade a entrar como candidata
+
+    for t in range(1, m_grade):
+        # O primeiro segmento também precisa de tamanho_minimo observações (custo infinito antes disso)
+        if posicoes[t] < tamanho_minimo:
+            continue
+
+        # Entram como candidatas as posições que deixam ao menos tamanho_minimo até t
+        while proximo < t and posicoes[t] - posicoes[proximo] >= tamanho_minimo:
+            if np.isfinite(custo_otimo[proximo]):
+                candidatos[n_candidatos] = proximo
+                podados_em[n_candidatos] = np.inf
+                n_candidatos += 1
+            proximo += 1
+
+        if n_candidatos == 0:
+            continue
+        ativos = candidatos[:n_candidatos]
+
+        custos = _custo_segmentos(
+            soma, soma_quadrados, posicoes[t] - posicoes[ativos], ativos, t, custo, piso_variancia
+        )
+        totais = custo_otimo[ativos] + custos
+        melhor = np.argmin(totais)
+        custo_otimo[t] = totais[melhor] + penalidade
+        anterior[t] = ativos[melhor]
+
+        # Poda: um candidato que falha o teste em t só é dominado a partir de
+        # t + tamanho_minimo (antes disso t ainda não pode ser a última mudança)
+        podados = podados_em[:n_candidatos]
+        podados[(totais > custo_otimo[t]) & np.isinf(podados)] = posicoes[t]
+        if t + 1 < m_grade:
+            mantidos = posicoes[t + 1] - podados < tamanho_minimo
+            n_candidatos = int(mantidos.sum())
+            candidatos[:n_candidatos] = ativos[mantidos]
+            podados_em[:n_candidatos] = podados[mantidos]
+
+    return _reconstruir(anterior, posicoes)
+
+
+# Função de referência: partição ótima sem poda (O(n²)), para conferir o PELT
+def _particao_otima(valores, custo='media_variancia', penalidade=None, tamanho_minimo=TAMANHO_MINIMO, passo=1):
+    valores = np.asarray(valores, dtype=float)
+    if len(valores) < 2 * tamanho_minimo:
+        return np.array([], dtype=int)
+    posicoes, soma, soma_quadrados, piso_variancia, penalidade = _preparar(valores, custo, penalidade, passo)
+
+    custo_otimo = np.full(len(posicoes), np.inf)
+    custo_otimo[0] = -penalidade
+    anterior = np.zeros(len(posicoes), dtype=int)
+    for t in range(1, len(posicoes)):
+        inicios = np.arange(t)
+        inicios = inicios[(posicoes[t] - posicoes[inicios] >= tamanho_minimo) & np.isfinite(custo_otimo[inicios])]
+        if len(inicios) == 0:
+            continue
+        totais = custo_otimo[inicios] + _custo_segmentos(
+            soma, soma_quadrados, posicoes[t] - posicoes[inicios], inicios, t, custo, piso_variancia
+        )
+        melhor = np.argmin(totais)
+        custo_otimo[t] = totais[melhor] + penalidade
+        anterior[t] = inicios[melhor]
+    return _reconstruir(anterior, posicoes)
+
+
+# Função para detectar os regimes de preço ao longo da série
+def detectar_regimes(df, custo='media_variancia', penalidade=None, tamanho_minimo=TAMANHO_MINIMO, passo=None):
+    """
+    Detecta regimes sobre os retornos logarítmicos diários do preço.
+
+    Com o custo 'media_variancia', um novo regime começa quando mudam a
+    tendência (média dos retornos) ou a volatilidade, como nas crises.
+
+    Parâmetros:
+    - df: DataFrame ordenado com as colunas 'ds' e 'y'.
+
+    Retorna:
+    - DataFrame com 'inicio', 'fim', 'observacoes', 'preco_medio',
+      'volatilidade' (anualizada) e 'crise'.
+    """
+    if len(df) < 2:
+        raise ValueError("A série é curta demais para detectar regimes.")
+
+    precos = df['y'].to_numpy(dtype=float)
+    if (precos <= 0).any():
+        raise ValueError("Os preços devem ser positivos para o cálculo dos retornos.")
+    retornos = np.diff(np.log(precos))
+    datas = df['ds'].to_numpy()[1:]
+
+    mudancas = pelt(retornos, custo, penalidade, tamanho_minimo, passo)
+    inicios = np.concatenate(([0], mudancas))
+    fins = np.append(mudancas, len(retornos))
+
+    # Estatísticas de todos os regimes de uma vez, pelas somas acumuladas
+    tamanhos = fins - inicios
+    soma = np.concatenate(([0.0], np.cumsum(retornos)))
+    soma_quadrados = np.concatenate(([0.0], np.cumsum(retornos ** 2)))
+    soma_precos = np.concatenate(([0.0], np.cumsum(precos[1:])))
+    medias = (soma[fins] - soma[inicios]) / tamanhos
+    variancias = (soma_quadrados[fins] - soma_quadrados[inicios]) / tamanhos - medias ** 2
+    volatilidade = np.sqrt(np.maximum(variancias, 0) * DIAS_UTEIS_ANO)
+
+    regimes = pd.DataFrame({
+        'inicio': pd.to_datetime(datas[inicios]),
+        'fim': pd.to_datetime(datas[fins - 1]),
+        'observacoes': tamanhos,
+        'preco_medio': (soma_precos[fins] - soma_precos[inicios]) / tamanhos,
+        'volatilidade': volatilidade,
+    })
+    regimes['crise'] = regimes['volatilidade'] >= FATOR_CRISE * regimes['volatilidade'].median()
+    return regimes
+
+
+# Função para obter as datas de mudança de regime (ex.: changepoints do Prophet)
+def datas_mudanca(regimes):
+    return list(regimes['inicio'].iloc[1:])
+
+
+# Função para destacar os regimes de crise em um gráfico do matplotlib
+def anotar_regimes(ax, regimes, apenas_crises=True, cor='red'):
+    selecionados = regimes[regimes['crise']] if apenas_crises else regimes
+    for regime in selecionados.itertuples():
+        ax.axvspan(regime.inicio, regime.fim, color=cor, alpha=0.15)
+
+
+if __name__ == "__main__":
+    import os
+    import postech_TC4
+
+    caminho_arquivo = os.path.join("data", "ipeadata[04-11-2024-09-30].csv")
+
+    try:
+        # O PELT deve coincidir com a partição ótima sem poda (séries curtas, com mudanças de média e variância)
+        gerador = np.random.default_rng(1)
+        for _ in range(30):
+            limites = np.sort(gerador.choice(np.arange(30, 270), size=3, replace=False))
+            segmentos = np.split(np.arange(300), limites)
+            serie = np.concatenate([
+                gerador.normal(gerador.normal(0, 2), gerador.choice([0.5, 1, 3]), len(segmento))
+                for segmento in segmentos
+            ])
+            for custo in ('media', 'media_variancia'):
+                esperado = _particao_otima(serie, custo, tamanho_minimo=10)
+                obtido = pelt(serie, custo, tamanho_minimo=10)
+                if not np.array_equal(esperado, obtido):
+                    raise ValueError(f"PELT divergiu da partição ótima: {obtido} != {esperado}")
+        print("PELT idêntico à partição ótima sem poda em 30 séries sintéticas")
+
+        df = postech_TC4.carregar_dados(caminho_arquivo, data_inicio=None)
+        inicio = time.perf_counter()
+        regimes = detectar_regimes(df)
+        print(f"Série completa ({len(df)} pontos): {time.perf_counter() - inicio:.3f}s")
+        print(regimes.to_string(index=False, float_format="{:.2f}".format))
+
+        # Série sintética com mudanças de volatilidade a cada 2.000 pontos
+        gerador = np.random.default_rng(0)
+        for n, passo in ((100_000, 1), (100_000, None), (1_000_000, None)):
+            escala = np.repeat(gerador.choice([0.5, 1, 2, 4], size=n // 2000 + 1), 2000)[:n]
+            serie = gerador.normal(size=n) * escala
+            inicio = time.perf_counter()
+            mudancas = pelt(serie, passo=passo)
+            descricao = 'exata' if passo == 1 else f'passo {max(1, int(np.ceil(n / LIMITE_EXATO)))}'
+            print(
+                f"Sintética ({n} pontos, {descricao}): {time.perf_counter() - inicio:.3f}s, "
+                f"{len(mudancas)} mudanças"
+            )
+    except Exception as e:
+        print(f"Erro: {e}")
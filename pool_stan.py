@@ -0,0 +1,319 @@
+import os
+import time
+import shutil
+import tempfile
+import functools
+import threading
+import multiprocessing as mp
+from multiprocessing import util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Diretório em memória (tmpfs) usado para os arquivos temporários do cmdstanpy
+DIRETORIO_TMPFS = '/dev/shm'
+
+# Prefixo dos diretórios de trabalho dos workers (seguido do PID do worker)
+PREFIXO_SCRATCH = 'petro_stan_'
+
+# Diretório de trabalho do processo worker (definido no inicializador)
+_SCRATCH = None
+
+# Entradas do diretório de trabalho criadas ao carregar o Stan (ex.: diretório
+# temporário do cmdstanpy), que são esvaziadas mas não removidas após cada tarefa
+_PRESERVADOS = set()
+
+# Variável de ambiente com o número de workers do pool padrão (ex.: config var no Heroku)
+VARIAVEL_WORKERS = 'PETRO_STAN_WORKERS'
+
+# Limite do número de workers do pool padrão: cada worker aquecido ocupa cerca
+# de 215 MB de RSS, e o pool é criado no mesmo dyno/contêiner do app
+LIMITE_WORKERS = 2
+
+
+# Função para verificar se um processo ainda está em execução (zumbis contam como encerrados)
+def _processo_vivo(pid):
+    """
+    Consulta apenas o /proc: fora do Linux não há sondagem segura (no Windows,
+    `os.kill(pid, 0)` encerra o processo em vez de testá-lo).
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as arquivo:
+            return arquivo.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+
+
+# Função para remover diretórios de trabalho de workers que já morreram
+def limpar_scratch_orfaos(diretorio_base=DIRETORIO_TMPFS):
+    """
+    Workers encerrados à força (ex.: SIGKILL, falta de memória) não executam o
+    Finalize e deixam o diretório de trabalho no tmpfs, ocupando RAM. Remove os
+    diretórios cujo processo dono não existe mais. Sem /proc (ex.: Windows, macOS)
+    não há como saber se o dono está vivo, e nada é removido.
+
+    Retorna:
+    - Número de diretórios removidos.
+    """
+    if not os.path.isdir('/proc/self'):
+        return 0
+
+    base = diretorio_base if diretorio_base and os.path.isdir(diretorio_base) else tempfile.gettempdir()
+    removidos = 0
+    for nome in os.listdir(base):
+        if not nome.startswith(PREFIXO_SCRATCH):
+            continue
+        pid = nome[len(PREFIXO_SCRATCH):].split('_')[0]
+        if not pid.isdigit() or _processo_vivo(int(pid)):
+            continue
+        shutil.rmtree(os.path.join(base, nome), ignore_errors=True)
+        removidos += 1
+    return removidos
+
+
+# Função para contar as CPUs que este processo pode usar
+def cpus_disponiveis():
+    """
+    Respeita a afinidade do processo (ex.: limites de cpuset de contêineres);
+    o `os.cpu_count()` conta as CPUs do host inteiro.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # sem sched_getaffinity (ex.: Windows, macOS)
+        return os.cpu_count() or 1
+
+
+# Função para definir o número de workers do pool padrão
+def workers_padrao():
+    """
+    Usa a variável de ambiente PETRO_STAN_WORKERS, se definida; senão, uma CPU
+    disponível a menos (a outra fica com o servidor), limitado a LIMITE_WORKERS.
+    """
+    valor = os.environ.get(VARIAVEL_WORKERS)
+    if valor:
+        try:
+            n_workers = int(valor)
+        except ValueError:
+            raise ValueError(f"{VARIAVEL_WORKERS} deve ser um número inteiro, não {valor!r}.")
+        if n_workers < 1:
+            raise ValueError(f"{VARIAVEL_WORKERS} deve ser maior que zero.")
+        return n_workers
+    return max(1, min(cpus_disponiveis() - 1, LIMITE_WORKERS))
+
+
+# Função executada uma única vez em cada worker ao iniciar o pool
+def _inicializar_worker(diretorio_base):
+    """
+    Prepara o worker: cria um diretório de trabalho em tmpfs, aponta o
+    tempfile para ele antes de importar o cmdstanpy e carrega o modelo Stan.
+    """
+    global _SCRATCH, _PRESERVADOS
+
+    base = diretorio_base if diretorio_base and os.path.isdir(diretorio_base) else None
+    _SCRATCH = tempfile.mkdtemp(prefix=f'{PREFIXO_SCRATCH}{os.getpid()}_', dir=base)
+    os.environ['TMPDIR'] = _SCRATCH
+    tempfile.tempdir = _SCRATCH
+
+    # Workers do multiprocessing não executam atexit; Finalize garante a limpeza
+    util.Finalize(None, shutil.rmtree, args=(_SCRATCH, True), exitpriority=0)
+
+    # Importar o Prophet (e o cmdstanpy) e carregar o executável Stan compilado
+    import postech_TC4
+    postech_TC4.criar_modelo_prophet()
+    _PRESERVADOS = set(os.listdir(_SCRATCH))
+
+
+# Função para esvaziar um diretório sem removê-lo
+def _esvaziar(diretorio, preservar=()):
+    for nome in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, nome)
+        if nome in preservar:
+            if os.path.isdir(caminho):
+                _esvaziar(caminho)
+        elif os.path.isdir(caminho):
+            shutil.rmtree(caminho, ignore_errors=True)
+        else:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+
+# Função para remover os arquivos deixados no diretório de trabalho após cada tarefa
+def _limpar_scratch():
+    """
+    Os ajustes do projeto usam um diretório de saída próprio (ver
+    `postech_TC4.ajustar_prophet`); esta limpeza cobre os demais, como os
+    folds da validação cruzada do Prophet.
+    """
+    if _SCRATCH is not None and os.path.isdir(_SCRATCH):
+        _esvaziar(_SCRATCH, _PRESERVADOS)
+
+
+# Função executada no worker para ajustar um modelo Prophet
+def _ajustar_no_worker(dados_treino, frequencia='D', changepoints=None):
+    from prophet.serialize import model_to_json
+    import postech_TC4
+
+    try:
+        modelo = postech_TC4.criar_modelo_prophet(frequencia, changepoints)
+        postech_TC4.ajustar_prophet(modelo, dados_treino)
+        return model_to_json(modelo)
+    finally:
+        _limpar_scratch()
+
+
+# Função que envolve tarefas genéricas (ex.: folds da validação cruzada)
+def _executar_tarefa(funcao, *args):
+    try:
+        return funcao(*args)
+    finally:
+        _limpar_scratch()
+
+
+class PoolStan:
+    """
+    Pool persistente de processos com o Prophet/Stan já carregados.
+
+    Os ajustes são enviados aos workers via IPC e os arquivos temporários do
+    cmdstanpy ficam em um diretório em tmpfs reaproveitado entre os ajustes.
+    Um ajuste MAP isolado não fica mais rápido no pool; ele serve para rodar
+    vários ajustes em paralelo (cadeias MCMC, membros do ensemble, folds).
+    O objeto pode ser passado como `parallel` para `prophet.diagnostics.cross_validation`.
+    Se um worker morrer (ex.: falta de memória), o pool é recriado e a tarefa repetida uma vez.
+    """
+
+    def __init__(self, n_workers=None, diretorio_base=DIRETORIO_TMPFS):
+        if n_workers is None:
+            n_workers = workers_padrao()
+        if n_workers < 1:
+            raise ValueError("O número de workers deve ser maior que zero.")
+
+        self.n_workers = n_workers
+        self._diretorio_base = diretorio_base
+        self._trava = threading.Lock()
+        self._executor = self._criar_executor()
+
+    def _criar_executor(self):
+        # Diretórios de workers mortos (ex.: antes de uma recriação do pool) são removidos
+        limpar_scratch_orfaos(self._diretorio_base)
+        # 'spawn' evita fork de um processo com threads (ex.: servidor do Streamlit)
+        return ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=mp.get_context('spawn'),
+            initializer=_inicializar_worker,
+            initargs=(self._diretorio_base,),
+        )
+
+    def _executar(self, operacao):
+        """
+        Executa `operacao(executor)`; se o pool estiver quebrado, recria o executor
+        (uma única vez, mesmo com várias sessões falhando ao mesmo tempo) e repete.
+        """
+        executor = self._executor
+        try:
+            return operacao(executor)
+        except BrokenProcessPool:
+            with self._trava:
+                if self._executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._criar_executor()
+            return operacao(self._executor)
+
+    def aquecer(self):
+        """
+        Inicia todos os workers e aguarda o carregamento do modelo Stan.
+        """
+        def _aquecer(executor):
+            futuros = [executor.submit(os.getpid) for _ in range(self.n_workers)]
+            for futuro in futuros:
+                futuro.result()
+
+        self._executar(_aquecer)
+
+    def ajustar(self, dados_treino, frequencia='D', changepoints=None):
+        """
+        Ajusta um modelo Prophet em um worker e retorna o modelo desserializado.
+        """
+        from prophet.serialize import model_from_json
+
+        modelo_json = self._executar(
+            lambda executor: executor.submit(
+                _ajustar_no_worker, dados_treino, frequencia, changepoints
+            ).result()
+        )
+        return model_from_json(modelo_json)
+
+    def map(self, funcao, *iteraveis):
+        # Os argumentos são materializados para que a tarefa possa ser repetida
+        argumentos = [list(iteravel) for iteravel in iteraveis]
+        tarefa = functools.partial(_executar_tarefa, funcao)
+        return self._executar(lambda executor: list(executor.map(tarefa, *argumentos)))
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+
+# Função para medir o tempo médio de ajuste (em segundos) de cada estratégia
+def medir_overhead(dados_treino, repeticoes=5):
+    """
+    Compara o tempo por ajuste em três cenários:
+    - 'processo_novo': um processo novo por ajuste (custo de inicialização completo);
+    - 'em_processo': ajuste direto no processo atual, como o app faz hoje;
+    - 'pool_aquecido': ajuste em um worker persistente do PoolStan.
+
+    Retorna:
+    - Dicionário com a lista de tempos de cada cenário.
+    """
+    import postech_TC4
+
+    tempos = {'processo_novo': [], 'em_processo': [], 'pool_aquecido': []}
+
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        with PoolStan(n_workers=1) as pool:
+            pool.ajustar(dados_treino)
+        tempos['processo_novo'].append(time.perf_counter() - inicio)
+
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        postech_TC4.treinar_modelo_prophet(dados_treino)
+        tempos['em_processo'].append(time.perf_counter() - inicio)
+
+    with PoolStan(n_workers=1) as pool:
+        pool.aquecer()
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            pool.ajustar(dados_treino)
+            tempos['pool_aquecido'].append(time.perf_counter() - inicio)
+
+    return tempos
+
+
+if __name__ == "__main__":
+    import statistics
+    import postech_TC4
+
+    caminho_arquivo = os.path.join("data", "ipeadata[04-11-2024-09-30].csv")
+
+    try:
+        df = postech_TC4.carregar_dados(caminho_arquivo)
+        dados_treino, _ = postech_TC4.dividir_dados(df, proporcao_treino=0.8)
+
+        tempos = medir_overhead(dados_treino)
+        referencia = min(tempos['pool_aquecido'])
+        for cenario, valores in tempos.items():
+            mediana = statistics.median(valores)
+            print(
+                f"{cenario:>14}: mediana {mediana:.3f}s por ajuste "
+                f"(overhead vs. melhor ajuste aquecido: {mediana - referencia:+.3f}s)"
+            )
+    except Exception as e:
+        print(f"Erro: {e}")
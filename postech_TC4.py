@@ -1,3 +1,5 @@
+import shutil
+import tempfile
 import numpy as np
 import pandas as pd
 from prophet import Prophet
@@ -13,12 +15,13 @@ def converter_excel_para_csv(arquivo_excel, arquivo_csv):
         raise ValueError(f"Erro ao converter o arquivo Excel para CSV: {e}")
 
 # Função para carregar e tratar dados do arquivo CSV
-def carregar_dados(arquivo):
+def carregar_dados(arquivo, data_inicio='2000-01-01'):
     """
     Carrega e trata os dados de um arquivo Excel ou CSV e transforma em um DataFrame.
 
     Parâmetros:
     - arquivo: Caminho do arquivo (Excel ou CSV).
+    - data_inicio: Primeira data considerada; None mantém todo o histórico (desde 1987).
 
     Retorna:
     - DataFrame tratado.
@@ -53,7 +56,8 @@ def carregar_dados(arquivo):
     df['ds'] = pd.to_datetime(df['ds'], errors='coerce')
     df['y'] = pd.to_numeric(df['y'], errors='coerce')
     df.dropna(subset=['ds', 'y'], inplace=True)
-    df = df[df['ds'] >= '2000-01-01']
+    if data_inicio is not None:
+        df = df[df['ds'] >= data_inicio]
     df = df[df['ds'].dt.dayofweek < 5]  # Considerar apenas dias úteis
     df.sort_values('ds', inplace=True)  # Garantir que os dados estão ordenados
     df.reset_index(drop=True, inplace=True)
@@ -77,32 +81,141 @@ def dividir_dados(df, proporcao_treino=0.8):
 
     return dados_treino, dados_teste
 
-# Função para treinar o modelo Prophet
-def treinar_modelo_prophet(dados_treino):
-    if dados_treino.empty:
-        raise ValueError("O conjunto de dados de treino está vazio.")
+# Função para criar o modelo Prophet com a configuração padrão do projeto
+def criar_modelo_prophet(frequencia='D', changepoints=None):
+    """
+    Cria o modelo Prophet com a configuração do projeto.
+
+    Parâmetros:
+    - frequencia: Resolução dos dados ('D', 'W-FRI', 'ME' ou 'YE'). Sazonalidades e feriados
+      mais finos que a resolução são desativados, pois não podem ser estimados.
+    - changepoints: Datas fixas de mudança de tendência (ex.: regimes detectados em
+      `pontos_mudanca`); se None, o Prophet escolhe as datas candidatas.
 
+    Retorna:
+    - Modelo Prophet (não ajustado).
+    """
+    diario = frequencia == 'D'
     modelo = Prophet(
-        daily_seasonality=True,
-        weekly_seasonality=True,
-        yearly_seasonality=True,
+        daily_seasonality=diario,
+        weekly_seasonality=diario,
+        yearly_seasonality=frequencia != 'YE',
         seasonality_mode='additive',
         changepoint_prior_scale=0.05,  # Ajuste da flexibilidade da tendência
-        interval_width=0.95  # Intervalo de confiança de 95%
+        interval_width=0.95,  # Intervalo de confiança de 95%
+        changepoints=changepoints
     )
-    modelo.add_country_holidays(country_name='BR')
+    if diario:
+        modelo.add_country_holidays(country_name='BR')
+    return modelo
+
+# Função para ajustar um modelo Prophet com a saída do cmdstanpy em um diretório temporário próprio
+def ajustar_prophet(modelo, dados_treino, **kwargs):
+    """
+    Ajusta o modelo gravando os CSVs do cmdstanpy em um diretório criado para
+    este ajuste (dentro de `tempfile.gettempdir()`, o scratch em tmpfs nos
+    workers do PoolStan) e removido logo depois.
+
+    Parâmetros:
+    - modelo: Modelo Prophet (não ajustado).
+    - dados_treino: DataFrame com as colunas 'ds' e 'y'.
+    - kwargs: Argumentos extras do `fit` (ex.: chains, seed).
+
+    Retorna:
+    - O próprio modelo, ajustado.
+    """
+    diretorio = tempfile.mkdtemp(prefix='ajuste_')
+    try:
+        modelo.fit(dados_treino, output_dir=diretorio, **kwargs)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+    # O diretório já foi removido; a validação cruzada (que repete o fit_kwargs) não deve reutilizá-lo
+    modelo.fit_kwargs.pop('output_dir', None)
+    return modelo
+
+# Função para treinar o modelo Prophet
+def treinar_modelo_prophet(dados_treino, executor=None, frequencia='D', changepoints=None,
+                           mcmc_samples=0, n_cadeias=4, aquecimento=None):
+    """
+    Treina o modelo Prophet com os dados de treino.
+
+    Parâmetros:
+    - dados_treino: DataFrame com as colunas 'ds' e 'y'.
+    - executor: PoolStan opcional; quando informado, o ajuste é feito em um worker já aquecido.
+      Para um único ajuste MAP isso não é mais rápido que o ajuste no próprio processo (padrão).
+    - frequencia: Resolução dos dados de treino (ver `criar_modelo_prophet`).
+    - changepoints: Datas de mudança de tendência; as que caem fora do período de treino são ignoradas.
+    - mcmc_samples: Se maior que zero, ajusta por MCMC (com incerteza da sazonalidade) em vez de MAP,
+      com `n_cadeias` cadeias em paralelo (ver `mcmc.ajustar_mcmc`).
+    - aquecimento: Iterações de aquecimento por cadeia no MCMC; se None, usa `mcmc.AQUECIMENTO`.
+
+    Retorna:
+    - Modelo Prophet ajustado.
+    """
+    if dados_treino.empty:
+        raise ValueError("O conjunto de dados de treino está vazio.")
+
+    if changepoints is not None:
+        # O Prophet exige que as datas estejam estritamente dentro do período de treino
+        datas = pd.to_datetime(pd.Series(changepoints))
+        dentro = (datas > dados_treino['ds'].min()) & (datas < dados_treino['ds'].max())
+        changepoints = list(datas[dentro]) or None
+
+    if mcmc_samples > 0:
+        import mcmc
+        try:
+            return mcmc.ajustar_mcmc(
+                dados_treino, n_cadeias=n_cadeias, mcmc_samples=mcmc_samples, executor=executor,
+                frequencia=frequencia, changepoints=changepoints,
+                aquecimento=mcmc.AQUECIMENTO if aquecimento is None else aquecimento,
+            )
+        except Exception as e:
+            raise ValueError(f"Erro ao treinar o modelo Prophet: {e}")
+
+    if executor is not None:
+        try:
+            return executor.ajustar(dados_treino, frequencia=frequencia, changepoints=changepoints)
+        except Exception as e:
+            raise ValueError(f"Erro ao treinar o modelo Prophet: {e}")
+
+    modelo = criar_modelo_prophet(frequencia, changepoints)
 
     try:
-        modelo.fit(dados_treino)
+        ajustar_prophet(modelo, dados_treino)
     except Exception as e:
         raise ValueError(f"Erro ao treinar o modelo Prophet: {e}")
 
     return modelo
 
+# Função para treinar o modelo ARIMA
+def treinar_modelo_arima(dados_treino, ordem=(1, 1, 2)):
+    """
+    Treina um modelo ARIMA sobre a coluna 'y' dos dados de treino.
+
+    Parâmetros:
+    - dados_treino: DataFrame com as colunas 'ds' e 'y'.
+    - ordem: Tupla (p, d, q); o padrão (1, 1, 2) é o do Modelo 3 da análise do grupo.
+
+    Retorna:
+    - Resultado ajustado do statsmodels (ARIMAResults).
+    """
+    if dados_treino.empty:
+        raise ValueError("O conjunto de dados de treino está vazio.")
+
+    from statsmodels.tsa.arima.model import ARIMA
+
+    try:
+        return ARIMA(dados_treino['y'].to_numpy(), order=ordem).fit()
+    except Exception as e:
+        raise ValueError(f"Erro ao treinar o modelo ARIMA: {e}")
+
 # Função para realizar validação cruzada no modelo Prophet
-def cross_validation_prophet(modelo, horizon='30 days', period='15 days', initial='365 days'):
+def cross_validation_prophet(modelo, horizon='30 days', period='15 days', initial='365 days', executor=None):
     try:
-        df_cv = cross_validation(modelo, initial=initial, period=period, horizon=horizon)
+        # O Prophet aceita qualquer objeto com método map no parâmetro parallel
+        df_cv = cross_validation(
+            modelo, initial=initial, period=period, horizon=horizon, parallel=executor
+        )
         df_p = performance_metrics(df_cv)
     except Exception as e:
         raise ValueError(f"Erro durante a validação cruzada: {e}")
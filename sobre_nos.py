@@ -1,4 +1,4 @@
-import os
+import imagens
 import streamlit as st
 
 def main(): 
@@ -6,14 +6,15 @@ def main():
     Função principal que exibe a página "Sobre Nós".
     """
     # Função para exibir imagem e opcionalmente legenda
-    def exibir_imagem(imagem_path, legenda_texto=None, largura_imagem=150):
+    def exibir_imagem(imagem_nome, legenda_texto=None, largura_imagem=150):
         """
         Exibe uma imagem com uma legenda opcional.
         """
-        # Verifique se o arquivo existe antes de carregar
-        if os.path.exists(imagem_path):
+        # Bytes da imagem lidos uma única vez por processo (versão otimizada, se existir)
+        imagem = imagens.carregar_imagem(imagem_nome)
+        if imagem is not None:
 
-            st.image(imagem_path, width=largura_imagem)  # Ajusta a largura da imagem conforme necessário
+            st.image(imagem, width=largura_imagem)  # Ajusta a largura da imagem conforme necessário
             
             # Se a legenda for fornecida, exibe-a
             if legenda_texto:
@@ -22,11 +23,11 @@ def main():
                     unsafe_allow_html=True
                 )
         else:
-            st.error(f"A imagem '{imagem_path}' não foi encontrada!")
+            st.error(f"A imagem '{imagem_nome}' não foi encontrada!")
 
     # Exibir imagem sem legenda
-    imagem_path = "assents/view6.png"
-    exibir_imagem(imagem_path, "Petro Insights")  # Não passamos a legenda, pois é opcional
+    imagem_nome = "view6.png"
+    exibir_imagem(imagem_nome, "Petro Insights")  # Não passamos a legenda, pois é opcional
 
     # Exibir conteúdo da página "Sobre Nós"
     st.title("Sobre Nós")
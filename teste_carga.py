@@ -0,0 +1,448 @@
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+import numpy as np
+import pandas as pd
+
+# Arquivo enviado por cada sessão simulada e horizontes (em dias) testados em sequência
+ARQUIVO_DADOS = os.path.join("data", "ipeadata[04-11-2024-09-30].csv")
+HORIZONTES = (730, 90)
+
+# Rótulos dos widgets do app.py/dashboard.py usados pela simulação
+ROTULO_PAGINA = "Selecione uma página"
+ROTULO_HORIZONTE = "Período de previsão (em dias)"
+ROTULO_UPLOAD = "Escolha o arquivo CSV"
+
+# Índices das páginas no seletor do app.py
+PAGINA_ANALISE = 1
+PAGINA_SOBRE_NOS = 2
+
+# Tempo máximo (s) de uma execução do script antes de considerá-la travada
+TIMEOUT_EXECUCAO = 600
+
+# Linhas finais do log do servidor exibidas quando a inicialização ou uma sessão falha
+LINHAS_LOG = 40
+
+
+# Função para iniciar o servidor do Streamlit em segundo plano
+def iniciar_servidor(porta):
+    """
+    Inicia `streamlit run app.py` sem navegador e aguarda o endpoint de saúde.
+    A proteção XSRF é desativada para permitir o upload via cliente headless.
+    A saída do servidor vai para um arquivo de log, em `processo.caminho_log`.
+    """
+    comando = [
+        sys.executable, "-m", "streamlit", "run", "app.py",
+        "--server.headless", "true",
+        "--server.port", str(porta),
+        "--server.enableXsrfProtection", "false",
+        "--server.enableCORS", "false",
+        "--browser.gatherUsageStats", "false",
+    ]
+    descritor, caminho_log = tempfile.mkstemp(prefix="petro_carga_", suffix=".log")
+    with os.fdopen(descritor, "wb") as log:
+        processo = subprocess.Popen(comando, stdout=log, stderr=subprocess.STDOUT)
+    processo.caminho_log = caminho_log
+
+    url = f"http://localhost:{porta}/_stcore/health"
+    limite = time.time() + 60
+    while time.time() < limite:
+        if processo.poll() is not None:
+            exibir_log(caminho_log)
+            raise ValueError("O servidor do Streamlit encerrou durante a inicialização.")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return processo
+        except OSError:
+            time.sleep(0.5)
+
+    processo.terminate()
+    processo.wait()
+    exibir_log(caminho_log)
+    raise ValueError("O servidor do Streamlit não respondeu dentro do tempo limite.")
+
+
+# Função para exibir as linhas finais do log do servidor (na saída de erro)
+def exibir_log(caminho_log, linhas=LINHAS_LOG):
+    try:
+        with open(caminho_log, encoding="utf-8", errors="replace") as arquivo:
+            cauda = arquivo.readlines()[-linhas:]
+    except OSError:
+        return
+    print(f"--- Últimas linhas do log do servidor ({caminho_log}) ---", file=sys.stderr)
+    print("".join(cauda).rstrip(), file=sys.stderr)
+    print("---", file=sys.stderr)
+
+
+# Função para listar o processo do servidor e seus descendentes (ex.: workers do PoolStan)
+def _arvore_processos(pid):
+    pids = [pid]
+    for atual in pids:
+        try:
+            for tarefa in os.listdir(f"/proc/{atual}/task"):
+                with open(f"/proc/{atual}/task/{tarefa}/children") as arquivo:
+                    pids.extend(int(filho) for filho in arquivo.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+# Função para ler CPU acumulada (s) e memória residente (bytes) de um processo via /proc
+def _ler_proc(pid):
+    with open(f"/proc/{pid}/stat") as arquivo:
+        campos = arquivo.read().rsplit(")", 1)[1].split()
+    cpu = (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+    with open(f"/proc/{pid}/statm") as arquivo:
+        rss = int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return cpu, rss
+
+
+class AmostradorRecursos(threading.Thread):
+    """
+    Amostra periodicamente a CPU (%) e a memória residente (MB) do servidor
+    e de todos os seus processos filhos. Requer Linux (/proc).
+    """
+
+    def __init__(self, pid, intervalo=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.amostras = []
+        self._parar = threading.Event()
+
+    def medir(self):
+        cpu_total = rss_total = 0
+        for pid in _arvore_processos(self.pid):
+            try:
+                cpu, rss = _ler_proc(pid)
+            except OSError:
+                continue  # processo encerrou entre a listagem e a leitura
+            cpu_total += cpu
+            rss_total += rss
+        return cpu_total, rss_total
+
+    def run(self):
+        inicio = time.perf_counter()
+        cpu_anterior, _ = self.medir()
+        tempo_anterior = inicio
+        while not self._parar.wait(self.intervalo):
+            agora = time.perf_counter()
+            cpu, rss = self.medir()
+            self.amostras.append({
+                "tempo": agora - inicio,
+                "cpu_pct": 100 * (cpu - cpu_anterior) / (agora - tempo_anterior),
+                "rss_mb": rss / 2**20,
+            })
+            cpu_anterior, tempo_anterior = cpu, agora
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+class SessaoSimulada:
+    """
+    Cliente headless que fala o protocolo de WebSocket do Streamlit,
+    como uma aba do navegador: envia reexecuções com o estado dos widgets
+    e aguarda o fim de cada execução do script.
+    """
+
+    def __init__(self, porta, nome):
+        self.porta = porta
+        self.nome = nome
+        self.conexao = None
+        self.session_id = None
+        self.widgets = {}  # rótulo -> id do widget
+        self.estados = {}  # id do widget -> WidgetState
+        self.execucoes = []
+
+    async def conectar(self):
+        from tornado.websocket import websocket_connect
+
+        self.conexao = await websocket_connect(f"ws://localhost:{self.porta}/_stcore/stream")
+
+    async def encerrar(self):
+        if self.conexao is not None:
+            self.conexao.close()
+
+    async def _enviar(self, back_msg):
+        await self.conexao.write_message(back_msg.SerializeToString(), binary=True)
+
+    async def _receber(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        dados = await self.conexao.read_message()
+        if dados is None:
+            raise ValueError(f"{self.nome}: conexão encerrada pelo servidor.")
+        mensagem = ForwardMsg()
+        mensagem.ParseFromString(dados)
+        return mensagem
+
+    def definir(self, rotulo, **valor):
+        """
+        Altera o valor de um widget (ex.: `definir(ROTULO_HORIZONTE, int_value=730)`).
+        """
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        if rotulo not in self.widgets:
+            raise ValueError(f"{self.nome}: widget '{rotulo}' não encontrado na página.")
+        estado = WidgetState(id=self.widgets[rotulo], **valor)
+        self.estados[estado.id] = estado
+
+    async def executar(self, rotulo):
+        """
+        Reexecuta o script com o estado atual dos widgets e registra latência,
+        imagens exibidas e erros.
+        """
+        from streamlit.proto.Alert_pb2 import Alert
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ClientState_pb2 import ClientState
+
+        estado_cliente = ClientState()
+        estado_cliente.widget_states.widgets.extend(self.estados.values())
+
+        inicio = time.perf_counter()
+        await self._enviar(BackMsg(rerun_script=estado_cliente))
+
+        imagens, erros = [], []
+        while True:
+            mensagem = await asyncio.wait_for(self._receber(), TIMEOUT_EXECUCAO)
+            tipo = mensagem.WhichOneof("type")
+            if tipo == "new_session":
+                self.session_id = mensagem.new_session.initialize.session_id
+            elif tipo == "delta" and mensagem.delta.WhichOneof("type") == "new_element":
+                elemento = mensagem.delta.new_element
+                tipo_elemento = elemento.WhichOneof("type")
+                widget = getattr(elemento, tipo_elemento, None)
+                if hasattr(widget, "label") and hasattr(widget, "id"):
+                    self.widgets[widget.label] = widget.id
+                if tipo_elemento == "imgs":
+                    imagens.extend(imagem.url for imagem in elemento.imgs.imgs)
+                elif tipo_elemento == "alert" and elemento.alert.format == Alert.ERROR:
+                    erros.append(elemento.alert.body)
+                elif tipo_elemento == "exception":
+                    erros.append(elemento.exception.message)
+            elif tipo == "script_finished":
+                break
+
+        self.execucoes.append({
+            "sessao": self.nome,
+            "acao": rotulo,
+            "latencia": time.perf_counter() - inicio,
+            "imagens": tuple(imagens),
+            "erros": tuple(erros),
+        })
+
+    async def enviar_arquivo(self, caminho, rotulo=ROTULO_UPLOAD):
+        """
+        Faz o upload de um arquivo como o navegador: pede a URL ao servidor,
+        envia o arquivo por HTTP e atualiza o estado do file_uploader.
+        """
+        from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.Common_pb2 import FileURLsRequest, FileUploaderState, UploadedFileInfo
+
+        nome = os.path.basename(caminho)
+        with open(caminho, "rb") as arquivo:
+            conteudo = arquivo.read()
+
+        pedido = FileURLsRequest(request_id=uuid.uuid4().hex, file_names=[nome], session_id=self.session_id)
+        await self._enviar(BackMsg(file_urls_request=pedido))
+        while True:
+            mensagem = await asyncio.wait_for(self._receber(), TIMEOUT_EXECUCAO)
+            if mensagem.WhichOneof("type") == "file_urls_response":
+                urls = mensagem.file_urls_response.file_urls[0]
+                break
+
+        separador = uuid.uuid4().hex
+        corpo = (
+            f'--{separador}\r\nContent-Disposition: form-data; name="{nome}"; filename="{nome}"\r\n'
+            f"Content-Type: text/csv\r\n\r\n"
+        ).encode() + conteudo + f"\r\n--{separador}--\r\n".encode()
+        await AsyncHTTPClient().fetch(HTTPRequest(
+            f"http://localhost:{self.porta}{urls.upload_url}",
+            method="PUT",
+            body=corpo,
+            headers={"Content-Type": f"multipart/form-data; boundary={separador}"},
+        ))
+
+        info = UploadedFileInfo(name=nome, size=len(conteudo), file_id=urls.file_id, file_urls=urls)
+        self.definir(rotulo, file_uploader_state_value=FileUploaderState(uploaded_file_info=[info]))
+        await self.executar("upload")
+
+
+# Função com o roteiro de uma sessão: abrir, enviar dados, mudar horizonte e navegar
+async def roteiro_sessao(porta, nome, horizontes=HORIZONTES):
+    sessao = SessaoSimulada(porta, nome)
+    await sessao.conectar()
+    try:
+        await sessao.executar("abrir")
+        # Erro já na abertura (ex.: falha ao importar o app): o upload não encontraria o widget
+        erros = sessao.execucoes[-1]["erros"]
+        if erros:
+            raise ValueError(f"{nome}: o app exibiu erros ao abrir: {' | '.join(erros)}")
+        await sessao.enviar_arquivo(ARQUIVO_DADOS)
+        for horizonte in horizontes:
+            sessao.definir(ROTULO_HORIZONTE, int_value=horizonte)
+            await sessao.executar("horizonte")
+        sessao.definir(ROTULO_PAGINA, int_value=PAGINA_ANALISE)
+        await sessao.executar("analise_grupo")
+        sessao.definir(ROTULO_PAGINA, int_value=PAGINA_SOBRE_NOS)
+        await sessao.executar("sobre_nos")
+    finally:
+        await sessao.encerrar()
+    return sessao.execucoes
+
+
+# Função para executar N sessões simultâneas
+async def executar_sessoes(porta, n_sessoes, prefixo="sessao"):
+    resultados = await asyncio.gather(*[
+        roteiro_sessao(porta, f"{prefixo}-{i}") for i in range(n_sessoes)
+    ])
+    return [execucao for execucoes in resultados for execucao in execucoes]
+
+
+# Função para montar a referência de imagens de uma sessão executada sozinha
+def _referencia(execucoes):
+    referencia = {}
+    for posicao, execucao in enumerate(execucoes):
+        referencia[(posicao, execucao["acao"])] = execucao["imagens"]
+    return referencia
+
+
+# Função para detectar figuras corrompidas comparando com a execução isolada
+def detectar_corrupcao(execucoes, referencia):
+    """
+    Cada gráfico do matplotlib é servido com o hash do PNG na URL. Como os
+    dados e parâmetros são os mesmos, uma sessão concorrente deve produzir as
+    mesmas URLs que a sessão de referência executada sozinha; diferenças
+    indicam figuras misturadas entre sessões (estado global do pyplot).
+
+    Retorna:
+    - DataFrame com as execuções divergentes.
+    """
+    divergencias = []
+    for sessao, grupo in pd.DataFrame(execucoes).groupby("sessao", sort=False):
+        for posicao, execucao in enumerate(grupo.to_dict("records")):
+            esperado = referencia.get((posicao, execucao["acao"]))
+            if esperado is None:
+                continue
+            diferentes = len(set(execucao["imagens"]) ^ set(esperado))
+            if diferentes or len(execucao["imagens"]) != len(esperado):
+                divergencias.append({
+                    "sessao": sessao,
+                    "acao": execucao["acao"],
+                    "imagens": len(execucao["imagens"]),
+                    "esperadas": len(esperado),
+                    "divergentes": diferentes,
+                })
+    return pd.DataFrame(divergencias)
+
+
+# Função para calcular os percentis de latência por ação
+def percentis_latencia(execucoes):
+    df = pd.DataFrame(execucoes)
+    return df.groupby("acao", sort=False)["latencia"].agg(
+        n="count",
+        p50=lambda x: np.percentile(x, 50),
+        p90=lambda x: np.percentile(x, 90),
+        p99=lambda x: np.percentile(x, 99),
+        max="max",
+    )
+
+
+# Função principal do teste de carga
+def executar_teste_carga(n_sessoes=4, rodadas=3, porta=8599, limite_crescimento_mb=50):
+    """
+    Executa o teste de carga:
+    1. Uma sessão sozinha, duas vezes, para obter a referência das imagens
+       (ações cujas imagens mudam entre as duas execuções não são comparadas);
+    2. `rodadas` rodadas com `n_sessoes` sessões simultâneas;
+    3. Amostragem de CPU e memória do servidor durante todo o teste.
+
+    O crescimento de memória é medido entre o RSS logo após as sessões de
+    referência (já com caches e pool de workers aquecidos) e o RSS ao fim da
+    última rodada; assim uma única rodada também é avaliada.
+
+    Retorna:
+    - Dicionário com latências, divergências de figuras, memória base e por rodada e amostras de recursos.
+    """
+    if n_sessoes < 1 or rodadas < 1:
+        raise ValueError("O teste de carga precisa de ao menos uma sessão e uma rodada.")
+
+    servidor = iniciar_servidor(porta)
+    amostrador = AmostradorRecursos(servidor.pid)
+    amostrador.start()
+
+    try:
+        ref_1 = _referencia(asyncio.run(executar_sessoes(porta, 1, "referencia-1")))
+        ref_2 = _referencia(asyncio.run(executar_sessoes(porta, 1, "referencia-2")))
+        referencia = {chave: valor for chave, valor in ref_1.items() if ref_2.get(chave) == valor}
+        memoria_base = amostrador.medir()[1] / 2**20
+
+        execucoes, memoria_rodadas = [], []
+        for rodada in range(rodadas):
+            execucoes += asyncio.run(executar_sessoes(porta, n_sessoes, f"rodada{rodada}"))
+            memoria_rodadas.append(amostrador.medir()[1] / 2**20)
+    except Exception:
+        exibir_log(servidor.caminho_log)
+        raise
+    finally:
+        amostrador.parar()
+        servidor.terminate()
+        servidor.wait()
+    # Sem falhas, o log do servidor não é necessário (em caso de erro ele é mantido para inspeção)
+    os.remove(servidor.caminho_log)
+
+    crescimento = memoria_rodadas[-1] - memoria_base
+    return {
+        "latencias": percentis_latencia(execucoes),
+        "divergencias": detectar_corrupcao(execucoes, referencia),
+        "erros": [execucao for execucao in execucoes if execucao["erros"]],
+        "memoria_base": memoria_base,
+        "memoria_rodadas": memoria_rodadas,
+        "crescimento_memoria": crescimento,
+        "suspeita_vazamento": crescimento > limite_crescimento_mb,
+        "recursos": pd.DataFrame(amostrador.amostras),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga com sessões simultâneas do app Streamlit.")
+    parser.add_argument("--sessoes", type=int, default=4)
+    parser.add_argument("--rodadas", type=int, default=3)
+    parser.add_argument("--porta", type=int, default=8599)
+    args = parser.parse_args()
+
+    resultado = executar_teste_carga(args.sessoes, args.rodadas, args.porta)
+
+    print("Latência por ação (s):")
+    print(resultado["latencias"].to_string(float_format="{:.2f}".format))
+
+    recursos = resultado["recursos"]
+    if not recursos.empty:
+        print(f"\nCPU: média {recursos['cpu_pct'].mean():.0f}%, pico {recursos['cpu_pct'].max():.0f}%")
+        print(f"RSS: pico {recursos['rss_mb'].max():.0f} MB")
+    memoria = ", ".join(f"{valor:.0f}" for valor in resultado["memoria_rodadas"])
+    print(f"RSS após as sessões de referência (base, caches aquecidos): {resultado['memoria_base']:.0f} MB")
+    print(f"RSS ao fim de cada rodada (MB): {memoria}")
+    print(f"Crescimento da base até a última rodada: {resultado['crescimento_memoria']:+.0f} MB")
+    if resultado["suspeita_vazamento"]:
+        print(f"ATENÇÃO: memória cresceu {resultado['crescimento_memoria']:.0f} MB após o aquecimento.")
+
+    divergencias = resultado["divergencias"]
+    if divergencias.empty:
+        print("\nNenhuma figura divergente entre sessões.")
+    else:
+        print(f"\nFiguras divergentes em {len(divergencias)} execuções (possível corrupção entre sessões):")
+        print(divergencias.to_string(index=False))
+
+    if resultado["erros"]:
+        print(f"\n{len(resultado['erros'])} execuções exibiram erros, ex.: {resultado['erros'][0]['erros'][0]}")